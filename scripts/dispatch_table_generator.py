@@ -83,52 +83,46 @@ class DispatchTableOutputGenerator(OutputGenerator):
         if (genOpts.prefixText):
             for s in genOpts.prefixText:
                 write(s, file=self.outFile)
+        out = self.outFile
         # File Comment
-        file_comment = '// *** THIS FILE IS GENERATED - DO NOT EDIT ***\n'
-        file_comment += '// See dispatch_table_generator.py for modifications\n'
-        write(file_comment, file=self.outFile)
+        out.lines(['// *** THIS FILE IS GENERATED - DO NOT EDIT ***',
+                   '// See dispatch_table_generator.py for modifications',
+                   ''])
         # Copyright Notice
-        copyright =  '/*\n'
-        copyright += ' * Copyright (c) 2015-2016 The Khronos Group Inc.\n'
-        copyright += ' * Copyright (c) 2015-2016 Valve Corporation\n'
-        copyright += ' * Copyright (c) 2015-2016 LunarG, Inc.\n'
-        copyright += ' *\n'
-        copyright += ' * Licensed under the Apache License, Version 2.0 (the "License");\n'
-        copyright += ' * you may not use this file except in compliance with the License.\n'
-        copyright += ' * You may obtain a copy of the License at\n'
-        copyright += ' *\n'
-        copyright += ' *     http://www.apache.org/licenses/LICENSE-2.0\n'
-        copyright += ' *\n'
-        copyright += ' * Unless required by applicable law or agreed to in writing, software\n'
-        copyright += ' * distributed under the License is distributed on an "AS IS" BASIS,\n'
-        copyright += ' * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.\n'
-        copyright += ' * See the License for the specific language governing permissions and\n'
-        copyright += ' * limitations under the License.\n'
-        copyright += ' *\n'
-        copyright += ' * Author: Courtney Goeltzenleuchter <courtney@LunarG.com>\n'
-        copyright += ' * Author: Jon Ashburn <jon@lunarg.com>\n'
-        copyright += ' * Author: Mark Lobodzinski <mark@lunarg.com>\n'
-        copyright += ' */\n'
-
-        preamble = ''
-        preamble += '#include <vulkan/vulkan.h>\n'
-        preamble += '#include <vulkan/vk_layer.h>\n'
-        preamble += '#include <string.h>\n'
-
-        write(copyright, file=self.outFile)
-        write(preamble, file=self.outFile)
+        out.lines(['/*',
+                   ' * Copyright (c) 2015-2016 The Khronos Group Inc.',
+                   ' * Copyright (c) 2015-2016 Valve Corporation',
+                   ' * Copyright (c) 2015-2016 LunarG, Inc.',
+                   ' *',
+                   ' * Licensed under the Apache License, Version 2.0 (the "License");',
+                   ' * you may not use this file except in compliance with the License.',
+                   ' * You may obtain a copy of the License at',
+                   ' *',
+                   ' *     http://www.apache.org/licenses/LICENSE-2.0',
+                   ' *',
+                   ' * Unless required by applicable law or agreed to in writing, software',
+                   ' * distributed under the License is distributed on an "AS IS" BASIS,',
+                   ' * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.',
+                   ' * See the License for the specific language governing permissions and',
+                   ' * limitations under the License.',
+                   ' *',
+                   ' * Author: Courtney Goeltzenleuchter <courtney@LunarG.com>',
+                   ' * Author: Jon Ashburn <jon@lunarg.com>',
+                   ' * Author: Mark Lobodzinski <mark@lunarg.com>',
+                   ' */',
+                   ''])
+        # Preamble
+        out.lines(['#include <vulkan/vulkan.h>',
+                   '#include <vulkan/vk_layer.h>',
+                   '#include <string.h>',
+                   ''])
     #
     # Write generate and write dispatch tables to output file
     def endFile(self):
-        device_table = ''
-        instance_table = ''
-
-        device_table += self.OutputDispatchTable('device')
-        instance_table += self.OutputDispatchTable('instance')
-
-        write(device_table, file=self.outFile);
-        write("\n", file=self.outFile)
-        write(instance_table, file=self.outFile);
+        self.OutputDispatchTable('device', self.outFile)
+        self.outFile.write('\n\n\n')
+        self.OutputDispatchTable('instance', self.outFile)
+        self.outFile.line()
 
         # Finish processing in superclass
         OutputGenerator.endFile(self)
@@ -140,16 +134,15 @@ class DispatchTableOutputGenerator(OutputGenerator):
         avoid_entries = ['vkCreateInstance',
                          'vkCreateDevice']
         # Get first param type
-        params = cmdinfo.elem.findall('param')
-        info = self.getTypeNameTuple(params[0])
+        param = cmdinfo.signature.params[0]
 
         if name not in avoid_entries:
-            self.AddCommandToDispatchList(name, info[0], self.featureExtraProtect)
+            self.AddCommandToDispatchList(name, param.type, self.featureExtraProtect)
 
     #
     # Determine if this API should be ignored or added to the instance or device dispatch table
     def AddCommandToDispatchList(self, name, handle_type, protect):
-        handle = self.registry.tree.find("types/type/[name='" + handle_type + "'][@category='handle']")
+        handle = self.registry.handledict.get(handle_type)
         if handle == None:
             return
         if handle_type != 'VkInstance' and handle_type != 'VkPhysicalDevice' and name != 'vkGetInstanceProcAddr':
@@ -158,40 +151,29 @@ class DispatchTableOutputGenerator(OutputGenerator):
             self.instance_dispatch_list.append((name, self.featureExtraProtect))
         return
     #
-    # Retrieve the type and name for a parameter
-    def getTypeNameTuple(self, param):
-        type = ''
-        name = ''
-        for elem in param:
-            if elem.tag == 'type':
-                type = noneStr(elem.text)
-            elif elem.tag == 'name':
-                name = noneStr(elem.text)
-        return (type, name)
-    #
-    # Create a dispatch table from the appropriate list and return it as a string
-    def OutputDispatchTable(self, table_type):
-        entries = []
-        table = ''
+    # Write a dispatch table from the appropriate list to an Emitter
+    def OutputDispatchTable(self, table_type, out):
         if table_type == 'device':
             entries = self.device_dispatch_list
-            table += 'static inline void layer_init_device_dispatch_table(VkDevice device, VkLayerDispatchTable *table, PFN_vkGetDeviceProcAddr gpa) {\n'
-            table += '    memset(table, 0, sizeof(*table));\n'
-            table += '    // Device function pointers\n'
+            out.line('static inline void layer_init_device_dispatch_table(VkDevice device, VkLayerDispatchTable *table, PFN_vkGetDeviceProcAddr gpa) {')
+            out.indent()
+            out.line('memset(table, 0, sizeof(*table));')
+            out.line('// Device function pointers')
         else:
             entries = self.instance_dispatch_list
-            table += 'static inline void layer_init_instance_dispatch_table(VkInstance instance, VkLayerInstanceDispatchTable *table, PFN_vkGetInstanceProcAddr gpa) {\n'
-            table += '    memset(table, 0, sizeof(*table));\n'
-            table += '    // Instance function pointers\n'
+            out.line('static inline void layer_init_instance_dispatch_table(VkInstance instance, VkLayerInstanceDispatchTable *table, PFN_vkGetInstanceProcAddr gpa) {')
+            out.indent()
+            out.line('memset(table, 0, sizeof(*table));')
+            out.line('// Instance function pointers')
 
         for item in entries:
             # Remove 'vk' from proto name
             base_name = item[0][2:]
 
             if item[1] is not None:
-                table += '#ifdef %s\n' % item[1]
-            table += '    table->%s = (PFN_%s) gpa(%s, "%s");\n' % (base_name, item[0], table_type, item[0])
+                out.write('#ifdef %s\n' % item[1])
+            out.line('table->%s = (PFN_%s) gpa(%s, "%s");' % (base_name, item[0], table_type, item[0]))
             if item[1] is not None:
-                table += '#endif // %s\n' % item[1]
-        table += '}'
-        return table
+                out.write('#endif // %s\n' % item[1])
+        out.dedent()
+        out.write('}')
@@ -44,6 +44,50 @@ def enquote(str):
 def apiName(str):
     return str[0:2].lower() == 'vk' or str[0:3] == 'PFN'
 
+# Emitter - accumulates generated text as a list of chunks, joined only
+# when the text is needed, so building a large output piece by piece
+# doesn't copy it over and over as repeated string += does. It's also
+# file-like, so it can be the target of write().
+#   Emitter(indentUnit) - indentUnit is the text of one indentation level
+#   write(text) - append text
+#   emitter += text - same as write(text)
+#   line(text) - append text on its own line, at the current indentation
+#   lines(lines) - append each of a list of lines, as line() does
+#   indented(text) - append text after the current indentation
+#   indent() / dedent() - increase / decrease the current indentation
+#   getvalue() - return all the text so far
+class Emitter:
+    """Accumulates generated text in chunks"""
+    def __init__(self, indentUnit = '    '):
+        self.chunks = []
+        self.indentUnit = indentUnit
+        self.indentation = ''
+    def write(self, text):
+        self.chunks.append(text)
+    def __iadd__(self, text):
+        self.chunks.append(text)
+        return self
+    def line(self, text = ''):
+        self.chunks.append(self.indentation + text + '\n')
+    def lines(self, lines):
+        for text in lines:
+            self.chunks.append(self.indentation + text + '\n')
+    def indented(self, text):
+        self.chunks.append(self.indentation + text)
+    def indent(self):
+        self.indentation += self.indentUnit
+    def dedent(self):
+        self.indentation = self.indentation[:-len(self.indentUnit)]
+    def getvalue(self):
+        # Keep the joined text as the only chunk, so later calls are cheap
+        if (len(self.chunks) > 1):
+            self.chunks = [''.join(self.chunks)]
+        return self.chunks[0] if self.chunks else ''
+    def flush(self):
+        pass
+    def close(self):
+        pass
+
 # Primary sort key for regSortFeatures.
 # Sorts by category of the feature name string:
 #   Core API features (those defined with a <feature> tag)
@@ -157,12 +201,19 @@ class GeneratorOptions:
 #   level - 'error', 'warn', or 'diag'. 'error' will also
 #     raise a UserWarning exception
 #   *args - print()-style arguments
+# diag(*args) - log a 'diag' message. Diagnostics are usually disabled
+#   (no diagFile), so the arguments are only converted to strings and
+#   joined when they're enabled. Pass values as separate arguments rather
+#   than formatting them into a string first:
+#     self.diag('Enum', name, '-> value', value)
 # setExtMap(map) - specify a dictionary map from extension names to
 #   numbers, used in creating values for extension enumerants.
 # makeDir(directory) - create a directory, if not already done.
 #   Generally called from derived generators creating hierarchies.
 # beginFile(genOpts) - start a new interface file
 #   genOpts - GeneratorOptions controlling what's generated and how
+#   The file is rendered into an Emitter, outFile, and written out once
+#   by endFile().
 # endFile() - finish an interface file, closing it when done
 # beginFeature(interface, emit) - write interface for a feature
 # and tag generated features as having been done.
@@ -180,8 +231,8 @@ class GeneratorOptions:
 #   name - enum name
 # genCmd(cmdinfo) - generate interface for a command
 #   cmdinfo - CmdInfo for a command
-# isEnumRequired(enumElem) - return True if this <enum> element is required
-#   elem - <enum> element to test
+# isEnumRequired(enuminfo) - return True if this enum is required
+#   enuminfo - EnumInfo for the enum to test
 # makeCDecls(cmd) - return C prototype and function pointer typedef for a
 #     <command> Element, as a list of two strings
 #   cmd - Element for the <command>
@@ -225,9 +276,16 @@ class OutputGenerator:
     #   'warn' (warning)
     #   'error' (fatal error - raises exception after logging)
     # *args - print()-style arguments to direct to corresponding log
+    def diag(self, *args):
+        """Log a diagnostic message, if diagnostics are enabled"""
+        if (self.diagFile != None):
+            write('DIAG:', *args, file=self.diagFile)
     def logMsg(self, level, *args):
         """Log a message at the given level. Can be ignored or log to a file"""
-        if (level == 'error'):
+        if (level == 'diag'):
+            if (self.diagFile != None):
+                write('DIAG:', *args, file=self.diagFile)
+        elif (level == 'error'):
             strfile = io.StringIO()
             write('ERROR:', *args, file=strfile)
             if (self.errFile != None):
@@ -236,14 +294,12 @@ class OutputGenerator:
         elif (level == 'warn'):
             if (self.warnFile != None):
                 write('WARNING:', *args, file=self.warnFile)
-        elif (level == 'diag'):
-            if (self.diagFile != None):
-                write('DIAG:', *args, file=self.diagFile)
         else:
             raise UserWarning(
                 '*** FATAL ERROR in Generator.logMsg: unknown level:' + level)
     #
-    # enumToValue - parses and converts an <enum> tag into a value.
+    # enumToValue - parses and converts an enum into a value.
+    #   enuminfo - EnumInfo for the <enum> tag
     # Returns a list
     #   first element - integer representation of the value, or None
     #       if needsNum is False. The value must be a legal number
@@ -259,11 +315,11 @@ class OutputGenerator:
     #       typename specified by 'extends'. This requires probing
     #       the registry database, and imbeds knowledge of the
     #       Vulkan extension enum scheme in this function.
-    def enumToValue(self, elem, needsNum):
-        name = elem.get('name')
+    def enumToValue(self, enuminfo, needsNum):
+        name = enuminfo.name
         numVal = None
-        if ('value' in elem.keys()):
-            value = elem.get('value')
+        if (enuminfo.value != None):
+            value = enuminfo.value
             # print('About to translate value =', value, 'type =', type(value))
             if (needsNum):
                 numVal = int(value, 0)
@@ -272,24 +328,24 @@ class OutputGenerator:
             # t = enuminfo.elem.get('type')
             # if (t != None and t != '' and t != 'i' and t != 's'):
             #     value += enuminfo.type
-            self.logMsg('diag', 'Enum', name, '-> value [', numVal, ',', value, ']')
+            self.diag('Enum', name, '-> value [', numVal, ',', value, ']')
             return [numVal, value]
-        if ('bitpos' in elem.keys()):
-            value = elem.get('bitpos')
+        if (enuminfo.bitpos != None):
+            value = enuminfo.bitpos
             numVal = int(value, 0)
             numVal = 1 << numVal
             value = '0x%08x' % numVal
-            self.logMsg('diag', 'Enum', name, '-> bitpos [', numVal, ',', value, ']')
+            self.diag('Enum', name, '-> bitpos [', numVal, ',', value, ']')
             return [numVal, value]
-        if ('offset' in elem.keys()):
+        if (enuminfo.offset != None):
             # Obtain values in the mapping from the attributes
             enumNegative = False
-            offset = int(elem.get('offset'),0)
-            extnumber = int(elem.get('extnumber'),0)
-            extends = elem.get('extends')
-            if ('dir' in elem.keys()):
+            offset = int(enuminfo.offset,0)
+            extnumber = int(enuminfo.extnumber,0)
+            extends = enuminfo.extends
+            if ('dir' in enuminfo.elem.keys()):
                 enumNegative = True
-            self.logMsg('diag', 'Enum', name, 'offset =', offset,
+            self.diag('Enum', name, 'offset =', offset,
                 'extnumber =', extnumber, 'extends =', extends,
                 'enumNegative =', enumNegative)
             # Now determine the actual enumerant value, as defined
@@ -299,12 +355,12 @@ class OutputGenerator:
                 numVal = -numVal
             value = '%d' % numVal
             # More logic needed!
-            self.logMsg('diag', 'Enum', name, '-> offset [', numVal, ',', value, ']')
+            self.diag('Enum', name, '-> offset [', numVal, ',', value, ']')
             return [numVal, value]
         return [None, None]
     #
     def makeDir(self, path):
-        self.logMsg('diag', 'OutputGenerator::makeDir(' + path + ')')
+        self.diag('OutputGenerator::makeDir(' + path + ')')
         if not (path in self.madeDirs.keys()):
             # This can get race conditions with multiple writers, see
             # https://stackoverflow.com/questions/273192/
@@ -315,22 +371,50 @@ class OutputGenerator:
     def beginFile(self, genOpts):
         self.genOpts = genOpts
         #
-        # Open specified output file. Not done in constructor since a
-        # Generator can be used without writing to a file.
-        if (self.genOpts.filename != None):
-            filename = self.genOpts.directory + '/' + self.genOpts.filename
-            self.outFile = io.open(filename, 'w', encoding='utf-8')
-        else:
-            self.outFile = sys.stdout
+        # Render the output into memory. It's only written out by
+        # endFile(), to the specified file (and only if it changed, so
+        # regenerating an unchanged file doesn't touch its mtime and force
+        # dependent sources to be recompiled), or to stdout if there's no
+        # file. Not done in constructor since a Generator can be used
+        # without writing to a file.
+        self.outFile = Emitter()
     def endFile(self):
         self.errFile and self.errFile.flush()
         self.warnFile and self.warnFile.flush()
         self.diagFile and self.diagFile.flush()
-        self.outFile.flush()
-        if (self.outFile != sys.stdout and self.outFile != sys.stderr):
-            self.outFile.close()
+        if (self.genOpts.filename != None):
+            filename = self.genOpts.directory + '/' + self.genOpts.filename
+            self.writeIfChanged(filename, self.outFile.getvalue())
+        else:
+            sys.stdout.write(self.outFile.getvalue())
+        self.outFile = None
         self.genOpts = None
     #
+    # writeIfChanged - replace filename with text, unless its content is
+    # already identical. The text is written to a temporary file in the same
+    # directory, which is then renamed over the target, so readers never see
+    # a partially written file.
+    def writeIfChanged(self, filename, text):
+        # Match the newline translation of a text-mode file
+        contents = text.replace('\n', os.linesep).encode('utf-8')
+        try:
+            with open(filename, 'rb') as fp:
+                unchanged = (fp.read() == contents)
+        except OSError:
+            unchanged = False
+        if (unchanged):
+            self.diag('OutputGenerator::writeIfChanged:', filename, 'is unchanged')
+            return
+        tmpname = filename + '.' + str(os.getpid()) + '.tmp'
+        try:
+            with open(tmpname, 'wb') as fp:
+                fp.write(contents)
+            os.replace(tmpname, filename)
+        except BaseException:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+            raise
+    #
     def beginFeature(self, interface, emit):
         self.emit = emit
         self.featureName = interface.get('name')
@@ -388,7 +472,7 @@ class OutputGenerator:
             text = noneStr(elem.text)
             tail = noneStr(elem.tail)
             if (elem.tag == 'name' and aligncol > 0):
-                self.logMsg('diag', 'Aligning parameter', elem.text, 'to column', self.genOpts.alignFuncParam)
+                self.diag('Aligning parameter', elem.text, 'to column', self.genOpts.alignFuncParam)
                 # Align at specified column, if possible
                 paramdecl = paramdecl.rstrip()
                 oldLen = len(paramdecl)
@@ -397,7 +481,7 @@ class OutputGenerator:
                 # text.
                 paramdecl = paramdecl.ljust(aligncol-1) + ' '
                 newLen = len(paramdecl)
-                self.logMsg('diag', 'Adjust length of parameter decl from', oldLen, 'to', newLen, ':', paramdecl)
+                self.diag('Adjust length of parameter decl from', oldLen, 'to', newLen, ':', paramdecl)
             paramdecl += text + tail
         return paramdecl
     #
@@ -413,17 +497,17 @@ class OutputGenerator:
             if (elem.tag == 'name'):
                 # Align at specified column, if possible
                 newLen = len(paramdecl.rstrip())
-                self.logMsg('diag', 'Identifying length of', elem.text, 'as', newLen)
+                self.diag('Identifying length of', elem.text, 'as', newLen)
             paramdecl += text + tail
         return newLen
     #
-    # isEnumRequired(elem) - return True if this <enum> element is
+    # isEnumRequired(enuminfo) - return True if this enum is
     # required, False otherwise
-    # elem - <enum> element to test
-    def isEnumRequired(self, elem):
-        return (elem.get('extname') is None or
-                re.match(self.genOpts.addExtensions, elem.get('extname')) is not None or
-                self.genOpts.defaultExtensions == elem.get('supported'))
+    # enuminfo - EnumInfo for the enum to test
+    def isEnumRequired(self, enuminfo):
+        return (enuminfo.extname is None or
+                re.match(self.genOpts.addExtensions, enuminfo.extname) is not None or
+                self.genOpts.defaultExtensions == enuminfo.supported)
     #
     # makeCDecls - return C prototype and function pointer typedef for a
     #   command, as a two-element list of strings.
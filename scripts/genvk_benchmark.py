@@ -0,0 +1,491 @@
+#!/usr/bin/python3
+#
+# Copyright (c) 2017 The Khronos Group Inc.
+# Copyright (c) 2017 LunarG, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# genvk_benchmark.py - time the lvl_genvk.py generators
+#
+# Parses the registry once, then generates each target several times into
+# a scratch directory and reports the median time per target. This measures
+# the generators themselves, without interpreter startup or registry
+# parsing, so changes to reg.py and the *_generator.py scripts can be
+# compared directly by running it before and after.
+#
+# With -queries, it instead times the Registry's indexed queries against
+# the equivalent searches of the registry, as a guide for generator
+# authors.
+#
+# With -startup, it instead times the startup of lvl_genvk.py for each
+# target, in a fresh interpreter, and lists the slowest imports.
+#
+# With -phases, it instead times each phase of a run separately: parsing
+# the XML, Registry.parseTree(), and for each target, feature selection
+# and Pass 1 of apiGen(), Pass 2, and the generator's endFile(). Each
+# phase is run -warmup times untimed, then -repeat times, and its median
+# and percentiles are reported. -json saves the results, and -baseline
+# compares them with results saved earlier, exiting with status 1 if any
+# phase got slower by more than -threshold, so a change can be checked
+# for regressions before review. genvk_benchmark_baseline.json is the
+# stored baseline, made from vk.xml and all targets with
+#   genvk_benchmark.py -repeat 7 -warmup 2 -json genvk_benchmark_baseline.json
+# and a change is checked against it with
+#   genvk_benchmark.py -repeat 7 -warmup 2 -baseline genvk_benchmark_baseline.json
+# Times depend on the machine and Python version, both of which are noted
+# in the file, and a warning is given when they differ. In that case,
+# make a baseline from the unchanged tree first. Short phases vary by 10%
+# or more between runs on a busy machine, so repeat the check, or raise
+# -threshold, before treating a phase as a regression. Commit the
+# regenerated file along with changes which are meant to change the times.
+#
+# With -scales, it instead runs -phases on registries scaled up from the
+# registry by each factor given with genvk_scaler.py, and reports the
+# parsing and generation times and peak RSS for each factor, with the times
+# per unit of scale relative to the first factor, so generator costs that
+# grow faster than the registry can be spotted. -json saves the results,
+# and -diagfile writes the diagnostics for each factor to its own file.
+
+import argparse, json, os, platform, statistics, subprocess, sys, tempfile, time, timeit
+import xml.etree.ElementTree as etree
+import lvl_genvk, genvk_scaler
+from reg import Registry
+from generator import write
+
+# Generate target from reg repeat times, returning a list of elapsed times
+def timeTarget(reg, target, repeat, diag):
+    createGenerator, options = lvl_genvk.genOpts[target]
+    times = []
+    for i in range(repeat):
+        startTime = time.perf_counter()
+        gen = createGenerator(errFile=sys.stderr,
+                              warnFile=sys.stderr,
+                              diagFile=diag)
+        reg.setGenerator(gen)
+        reg.apiGen(options)
+        reg.apiReset()
+        times.append(time.perf_counter() - startTime)
+    return times
+
+# Summarize a list of times as a dictionary of their median, 10th and 90th
+# percentiles (interpolated between the nearest times), minimum and maximum
+def summarize(times):
+    ordered = sorted(times)
+    def percentile(p):
+        position = (len(ordered) - 1) * p / 100
+        lower = int(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+    return { 'median' : statistics.median(ordered),
+             'p10' : percentile(10),
+             'p90' : percentile(90),
+             'min' : ordered[0],
+             'max' : ordered[-1] }
+
+# Time parsing the registry XML file and Registry.parseTree() repeat times,
+# after warmup untimed runs. Returns a dictionary of the summarized times
+# keyed by phase name, and the last Registry parsed.
+def timeParse(registry, stream, repeat, warmup):
+    times = { 'parse/etree.parse' : [], 'parse/Registry.parseTree' : [] }
+    for i in range(warmup + repeat):
+        reg = Registry()
+        startTime = time.perf_counter()
+        if (stream):
+            tree = reg.parseFileStream(registry)
+        else:
+            tree = etree.parse(registry)
+        parseTime = time.perf_counter()
+        reg.loadElementTree(tree)
+        endTime = time.perf_counter()
+        if (i >= warmup):
+            times['parse/etree.parse'].append(parseTime - startTime)
+            times['parse/Registry.parseTree'].append(endTime - parseTime)
+    return dict([(phase, summarize(phaseTimes)) for phase, phaseTimes in times.items()]), reg
+
+# Time the phases of generating target from reg repeat times, after warmup
+# untimed runs: feature selection and Pass 1 of apiGen(), the rest of
+# Pass 2, and the generator's endFile(). Earlier feature selections are
+# discarded, so Pass 1 is run each time. Returns a dictionary of the
+# summarized times keyed by phase name.
+def timePhases(reg, target, repeat, warmup, diag):
+    createGenerator, options = lvl_genvk.genOpts[target]
+    times = { 'pass1' : [], 'pass2' : [], 'endFile' : [] }
+    for i in range(warmup + repeat):
+        runTimes = {}
+        # Wrap a method of an object to record its elapsed time in runTimes
+        def timed(phase, method):
+            def call(*args):
+                startTime = time.perf_counter()
+                result = method(*args)
+                runTimes[phase] = time.perf_counter() - startTime
+                return result
+            return call
+        gen = createGenerator(errFile=sys.stderr,
+                              warnFile=sys.stderr,
+                              diagFile=diag)
+        reg.setGenerator(gen)
+        reg.selections = {}
+        reg.interfaceHashes = {}
+        reg.selectAndTagFeatures = timed('pass1', reg.selectAndTagFeatures)
+        gen.endFile = timed('endFile', gen.endFile)
+        startTime = time.perf_counter()
+        reg.apiGen(options)
+        totalTime = time.perf_counter() - startTime
+        reg.apiReset()
+        del reg.selectAndTagFeatures
+        if (i >= warmup):
+            times['pass1'].append(runTimes['pass1'])
+            times['endFile'].append(runTimes['endFile'])
+            times['pass2'].append(totalTime - runTimes['pass1'] - runTimes['endFile'])
+    return dict([(target + '/' + phase, summarize(phaseTimes))
+                 for phase, phaseTimes in times.items()])
+
+# Compare the medians of phases with those of a baseline, both dictionaries
+# of summarized times keyed by phase name, writing a line per phase.
+# Returns the list of phases which are more than threshold (a fraction)
+# slower, ignoring differences of under minDelta seconds, which are within
+# the noise of timing short phases.
+def compareBaseline(phases, baseline, threshold, minDelta = 0.0005):
+    regressions = []
+    for phase, stats in phases.items():
+        if (phase not in baseline):
+            continue
+        old = baseline[phase]['median']
+        new = stats['median']
+        change = (new - old) / old if old else 0
+        slower = (change > threshold and new - old > minDelta)
+        if (slower):
+            regressions.append(phase)
+        write('%-45s baseline %.4fs  now %.4fs  %+6.1f%%%s' %
+              (phase, old, new, change * 100, '  REGRESSION' if slower else ''))
+    return regressions
+
+# Registry queries, as (description, indexed query, equivalent search)
+# tuples. Each query takes the Registry and returns a list of names.
+def firstParamType(cmd):
+    params = cmd.findall('param')
+    return params[0].find('type').text if params else None
+
+registryQueries = [
+    ('struct types',
+     lambda reg: reg.categorytypes['struct'],
+     lambda reg: [type.get('name') or type.find('name').text
+                  for type in reg.reg.findall('types/type')
+                  if type.get('category') == 'struct']),
+    ('handles with parent VkDevice',
+     lambda reg: reg.handlechildren['VkDevice'],
+     lambda reg: [type.find('name').text
+                  for type in reg.reg.findall('types/type')
+                  if (type.get('category') == 'handle' and
+                      'VkDevice' in (type.get('parent') or '').split(','))]),
+    ('commands dispatched on VkCommandBuffer',
+     lambda reg: reg.dispatchcmds['VkCommandBuffer'],
+     lambda reg: [cmd.find('proto/name').text
+                  for cmd in reg.reg.findall('commands/command')
+                  if firstParamType(cmd) == 'VkCommandBuffer']),
+    ('commands required by VK_KHR_swapchain',
+     lambda reg: reg.featurecmds['VK_KHR_swapchain'],
+     lambda reg: [cmd.get('name')
+                  for cmd in reg.reg.findall("extensions/extension[@name='VK_KHR_swapchain']/require/command")]),
+    ('owner of vkCreateSwapchainKHR',
+     lambda reg: [reg.ownerdict['vkCreateSwapchainKHR']],
+     lambda reg: [next(feature.get('name')
+                       for feature in reg.reg.findall('feature') + reg.extensions
+                       if feature.find("require/command[@name='vkCreateSwapchainKHR']") != None)]),
+    ('struct types containing an NDO',
+     lambda reg: [name for name in reg.categorytypes['struct']
+                  if reg.typeContains(name, 'ndo')],
+     lambda reg: [type.get('name') for type in reg.reg.findall('types/type')
+                  if (type.get('category') == 'struct' and
+                      searchContainsNdo(reg, type.get('name')))]),
+    ('commands using VkDescriptorImageInfo',
+     lambda reg: sorted(reg.commandsUsingType('VkDescriptorImageInfo')),
+     lambda reg: sorted(cmd.find('proto/name').text
+                        for cmd in reg.reg.findall('commands/command')
+                        if any(searchUsesType(reg, param.find('type').text, 'VkDescriptorImageInfo')
+                               for param in cmd.findall('param')))),
+]
+
+# Recursive searches of struct members, as generators did them
+def searchMemberTypes(reg, typename):
+    type = reg.reg.find("types/type[@name='%s']" % typename)
+    if (type == None):
+        return []
+    return [member.find('type').text for member in type.findall('member')]
+
+def searchContainsNdo(reg, typename):
+    for membertype in searchMemberTypes(reg, typename):
+        handle = reg.handledict.get(membertype)
+        if (handle != None and not handle.dispatchable):
+            return True
+        if (reg.categorydict.get(membertype) == 'struct' and
+            searchContainsNdo(reg, membertype)):
+            return True
+    return False
+
+def searchUsesType(reg, typename, used):
+    if (typename == used):
+        return True
+    return any(searchUsesType(reg, membertype, used)
+               for membertype in searchMemberTypes(reg, typename))
+
+# Time each registry query, returning a list of (description, indexed
+# time, search time) tuples. Times are per call, the best of repeat runs
+# of enough calls to take at least 0.2s.
+def timeQueries(reg, repeat):
+    results = []
+    for description, indexed, search in registryQueries:
+        if (indexed(reg) != search(reg)):
+            write('*** Query', description, 'differs from the equivalent search',
+                  file=sys.stderr)
+        times = []
+        for query in (indexed, search):
+            timer = timeit.Timer(lambda: query(reg))
+            number = timer.autorange()[0]
+            times.append(min(timer.repeat(number=number, repeat=repeat)) / number)
+        results.append((description, times[0], times[1]))
+    return results
+
+# Code run in a fresh interpreter to time the startup of lvl_genvk.py for
+# the targets given as arguments: importing it, creating the target
+# registry, and looking up the targets, which imports their generators. It
+# reports its own elapsed time, so interpreter startup isn't included, and
+# marks the start on stderr, so the imports it does can be told apart in
+# the -X importtime report.
+startupCode = '''
+import sys, time
+sys.stderr.write('* Starting\\n')
+sys.stderr.flush()
+startTime = time.perf_counter()
+import lvl_genvk
+lvl_genvk.makeGenOpts()
+for target in sys.argv[1:]:
+    lvl_genvk.genOpts[target]
+print(time.perf_counter() - startTime)
+'''
+
+# Time the startup of lvl_genvk.py for targets repeat times, each in a
+# fresh interpreter run with -X importtime. Returns a list of elapsed times,
+# and a list of (cumulative time, module name) tuples for the modules
+# imported directly by the startup code or by lvl_genvk.py in the last run.
+def timeStartup(targets, repeat):
+    times = []
+    for i in range(repeat):
+        result = subprocess.run([ sys.executable, '-X', 'importtime',
+                                  '-c', startupCode ] + targets,
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                universal_newlines=True, check=True)
+        times.append(float(result.stdout))
+    imports = []
+    report = result.stderr.split('* Starting\n', 1)[1]
+    for line in report.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        (self, cumulative, name) = line[len('import time:'):].split('|')
+        # Nested imports are indented by two spaces per level
+        if (len(name) - len(name.lstrip()) <= 3):
+            imports.append((int(cumulative) / 1e6, name.strip()))
+    return times, sorted(imports, reverse=True)
+
+# Run -phases in a fresh interpreter on the registry scaled by each factor
+# in scales, so that peak RSS is measured per registry. Returns a list of
+# dictionaries of the factor, the total median parse and generation times,
+# and the peak RSS in KB (None if it can't be measured), in the order of
+# scales. If stream is True, the registries are parsed with the streaming
+# loader. If diagfile isn't None, the diagnostics for each factor are
+# written to diagfile with '.x<factor>' appended.
+def timeScales(registry, scales, targets, repeat, warmup, stream, diagfile):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in scales:
+            scaled = os.path.join(directory, 'vk_x%g.xml' % scale)
+            output = os.path.join(directory, 'phases_x%g.json' % scale)
+            genvk_scaler.writeScaledRegistry(registry, scale, scaled)
+            options = []
+            if (stream):
+                options.append('-stream')
+            if (diagfile):
+                options += [ '-diagfile', os.path.abspath('%s.x%g' % (diagfile, scale)) ]
+            subprocess.run([ sys.executable, os.path.abspath(__file__),
+                             '-registry', scaled,
+                             '-repeat', str(repeat),
+                             '-warmup', str(warmup),
+                             '-json', output ] + options + targets,
+                           cwd=os.path.dirname(os.path.abspath(__file__)),
+                           stdout=subprocess.DEVNULL, check=True)
+            with open(output, 'r', encoding='utf-8') as f:
+                phases = json.load(f)
+            parse = sum([ stats['median'] for phase, stats in phases['phases'].items()
+                          if phase.startswith('parse/') ])
+            generate = sum([ stats['median'] for phase, stats in phases['phases'].items()
+                             if not phase.startswith('parse/') ])
+            results.append({ 'scale' : scale,
+                             'parse' : parse,
+                             'generate' : generate,
+                             'peakRSS' : phases['peakRSS'] })
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-registry', action='store',
+                        default='vk.xml',
+                        help='Use specified registry file instead of vk.xml')
+    parser.add_argument('-stream', action='store_true',
+                        help='Parse the registry with the streaming loader')
+    parser.add_argument('-repeat', action='store', type=int,
+                        default=5,
+                        help='Generate each target this many times')
+    parser.add_argument('-queries', action='store_true',
+                        help='Time registry queries instead of generating targets')
+    parser.add_argument('-startup', action='store_true',
+                        help='Time lvl_genvk.py startup for each target instead of generating targets')
+    parser.add_argument('-phases', action='store_true',
+                        help='Time the parsing and generation phases separately, with percentiles')
+    parser.add_argument('-warmup', action='store', type=int,
+                        default=1,
+                        help='Run each phase this many times before timing it')
+    parser.add_argument('-json', action='store',
+                        default=None,
+                        help='Save the phase times to specified JSON file (implies -phases)')
+    parser.add_argument('-baseline', action='store',
+                        default=None,
+                        help='Compare the phase times with specified JSON file saved by -json (implies -phases)')
+    parser.add_argument('-threshold', action='store', type=float,
+                        default=0.10,
+                        help='Fraction by which a phase may be slower than the baseline')
+    parser.add_argument('-scales', action='store',
+                        default=None,
+                        help='Time the phases on registries scaled by these comma-separated factors, e.g. 1,2,4')
+    parser.add_argument('-diagfile', action='store',
+                        default=None,
+                        help='Write diagnostics to specified file, to time with diagnostics enabled')
+    parser.add_argument('target', metavar='target', nargs='*',
+                        help='Specify target(s) to time, default all')
+
+    args = parser.parse_args()
+    if (args.scales and (args.queries or args.startup or args.baseline)):
+        parser.error('-scales can\'t be combined with -queries, -startup or -baseline')
+
+    if (args.startup):
+        lvl_genvk.makeGenOpts()
+        for target in args.target or list(lvl_genvk.genOpts.keys()):
+            times, imports = timeStartup([ target ], args.repeat)
+            write('%-30s median %.4fs  min %.4fs  max %.4fs' %
+                  (target, statistics.median(times), min(times), max(times)))
+            for cumulative, name in imports[0:5]:
+                write('    %-26s %.4fs' % (name, cumulative))
+        sys.exit(0)
+
+    if (args.scales):
+        scales = [ float(scale) for scale in args.scales.split(',') ]
+        results = timeScales(args.registry, scales, args.target,
+                             args.repeat, args.warmup, args.stream, args.diagfile)
+        first = results[0]
+        for result in results:
+            relative = first['scale'] / result['scale']
+            rss = '%dKB' % result['peakRSS'] if result['peakRSS'] != None else 'unknown'
+            write('x%-6g parse %.4fs (%.2f/scale)  generate %.4fs (%.2f/scale)  peak RSS %s' %
+                  (result['scale'],
+                   result['parse'], result['parse'] * relative / first['parse'],
+                   result['generate'], result['generate'] * relative / first['generate'],
+                   rss))
+        if (args.json):
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({ 'python' : sys.version.split()[0],
+                            'registry' : os.path.basename(args.registry),
+                            'repeat' : args.repeat,
+                            'warmup' : args.warmup,
+                            'scales' : results }, f, indent=2, sort_keys=True)
+                f.write('\n')
+        sys.exit(0)
+
+    if (args.phases or args.json or args.baseline):
+        diag = open(args.diagfile, 'w', encoding='utf-8') if args.diagfile else None
+        phases, reg = timeParse(args.registry, args.stream, args.repeat, args.warmup)
+        with tempfile.TemporaryDirectory() as directory:
+            lvl_genvk.makeGenOpts(directory = directory)
+            for target in args.target or list(lvl_genvk.genOpts.keys()):
+                phases.update(timePhases(reg, target, args.repeat, args.warmup, diag))
+        if (diag):
+            diag.close()
+
+        for phase, stats in phases.items():
+            write('%-45s median %.4fs  p10 %.4fs  p90 %.4fs' %
+                  (phase, stats['median'], stats['p10'], stats['p90']))
+        if (args.json):
+            results = { 'python' : sys.version.split()[0],
+                        'machine' : platform.platform(),
+                        'registry' : os.path.basename(args.registry),
+                        'repeat' : args.repeat,
+                        'warmup' : args.warmup,
+                        'peakRSS' : lvl_genvk.peakRSS(),
+                        'phases' : phases }
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write('\n')
+        if (args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            write('* Compared with', args.baseline)
+            if (baseline.get('python') != sys.version.split()[0] or
+                baseline.get('machine') != platform.platform()):
+                write('* The baseline was made with Python', baseline.get('python'),
+                      'on', baseline.get('machine'), '- make one on this machine to compare with',
+                      file=sys.stderr)
+            if (compareBaseline(phases, baseline['phases'], args.threshold)):
+                sys.exit(1)
+        sys.exit(0)
+
+    reg = Registry()
+    startTime = time.perf_counter()
+    if (args.stream):
+        tree = reg.parseFileStream(args.registry)
+    else:
+        tree = etree.parse(args.registry)
+    reg.loadElementTree(tree)
+    write('* Time to parse registry =', time.perf_counter() - startTime,
+          file=sys.stderr)
+    if (lvl_genvk.peakRSS() != None):
+        write('* Peak RSS after parsing registry =', lvl_genvk.peakRSS(), 'KB',
+              file=sys.stderr)
+
+    if (args.queries):
+        for description, indexedTime, searchTime in timeQueries(reg, args.repeat):
+            write('%-40s indexed %8.2fus  search %10.2fus' %
+                  (description, indexedTime * 1e6, searchTime * 1e6))
+        sys.exit(0)
+
+    diag = open(args.diagfile, 'w', encoding='utf-8') if args.diagfile else None
+
+    with tempfile.TemporaryDirectory() as directory:
+        lvl_genvk.makeGenOpts(extensions = [],
+                              removeExtensions = [],
+                              protect = True,
+                              directory = directory)
+        targets = args.target or list(lvl_genvk.genOpts.keys())
+
+        total = 0
+        totalMin = 0
+        for target in targets:
+            times = timeTarget(reg, target, args.repeat, diag)
+            median = statistics.median(times)
+            total += median
+            totalMin += min(times)
+            write('%-30s median %.4fs  min %.4fs  max %.4fs' %
+                  (target, median, min(times), max(times)))
+        write('%-30s median %.4fs  min %.4fs' % ('total', total, totalMin))
+
+    if (diag):
+        diag.close()
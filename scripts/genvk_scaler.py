@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+#
+# Copyright (c) 2017 The Khronos Group Inc.
+# Copyright (c) 2017 LunarG, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# genvk_scaler.py - make synthetic registries for stress-testing lvl_genvk.py
+#
+# Reads a registry and writes a copy scaled up by a factor, adding
+# synthetic extensions until the registry has about that many times the
+# enabled extensions, commands, structs and enum values of the original.
+# Each synthetic extension defines:
+#   - a non-dispatchable handle type
+#   - an enum type, with a share of the added enum values
+#   - a share of the added structs, each with an sType, a pNext member whose
+#     valid extension struct is the next struct in the extension, so they
+#     form a pNext chain, a member of the extension's handle type, an
+#     array of those handles, and from the second struct on, a pointer to
+#     the previous struct
+#   - a share of the added commands, each taking a VkDevice, one of the
+#     extension's structs and an array of its handles
+# so the generators see the same kinds of input as for vk.xml, in larger
+# amounts. genvk_benchmark.py -scales uses it to time generation against
+# registry size.
+
+import argparse, sys
+import xml.etree.ElementTree as etree
+from generator import write
+
+# Templates for the elements of synthetic extension {ext}
+handleTemplate = '''<type category="handle" parent="VkDevice"><type>VK_DEFINE_NON_DISPATCHABLE_HANDLE</type>(<name>VkSynObject{ext}</name>)</type>'''
+enumTypeTemplate = '''<type name="VkSynMode{ext}" category="enum"/>'''
+structTemplate = '''<type category="struct" name="VkSynInfo{ext}_{struct}">
+    <member values="VK_STRUCTURE_TYPE_SYN_INFO_{ext}_{struct}"><type>VkStructureType</type> <name>sType</name></member>
+    <member{nextStruct}>const <type>void</type>* <name>pNext</name></member>
+    <member><type>VkSynMode{ext}</type> <name>mode</name></member>
+    <member><type>VkSynObject{ext}</type> <name>object</name></member>
+    <member optional="true"><type>uint32_t</type> <name>objectCount</name></member>
+    <member len="objectCount">const <type>VkSynObject{ext}</type>* <name>pObjects</name></member>
+    {previousMember}
+</type>'''
+previousMemberTemplate = '''<member optional="true">const <type>VkSynInfo{ext}_{previous}</type>* <name>pPrevious</name></member>'''
+commandTemplate = '''<command successcodes="VK_SUCCESS" errorcodes="VK_ERROR_OUT_OF_HOST_MEMORY,VK_ERROR_OUT_OF_DEVICE_MEMORY">
+    <proto><type>VkResult</type> <name>vkSynUpdate{ext}_{command}</name></proto>
+    <param><type>VkDevice</type> <name>device</name></param>
+    {infoParam}
+    <param><type>uint32_t</type> <name>objectCount</name></param>
+    <param len="objectCount" externsync="true">const <type>VkSynObject{ext}</type>* <name>pObjects</name></param>
+</command>'''
+infoParamTemplate = '''<param>const <type>VkSynInfo{ext}_{struct}</type>* <name>pInfo</name></param>'''
+
+# Return the share of total items for the index'th of count parts, so the
+# parts add up to exactly total
+def share(total, index, count):
+    return total * (index + 1) // count - total * index // count
+
+# Add synthetic extensions to the <registry> Element root, scaling its
+# enabled extensions, commands, structs and enum values by about scale.
+# Returns a dictionary of the number of each added, keyed by kind.
+def scaleRegistry(root, scale):
+    types = root.find('types')
+    commands = root.find('commands')
+    extensions = root.find('extensions')
+    groups = [ enums for enums in root.findall('enums')
+               if enums.get('type') in ('enum', 'bitmask') ]
+
+    original = {
+        'extensions' : len([ ext for ext in extensions.findall('extension')
+                             if ext.get('supported') != 'disabled' ]),
+        'commands' : len(commands.findall('command')),
+        'structs' : len([ type for type in types.findall('type')
+                          if type.get('category') == 'struct' ]),
+        'enum values' : sum([ len(group.findall('enum')) for group in groups ])
+    }
+    added = dict([(kind, int(round(count * (scale - 1))))
+                  for kind, count in original.items()])
+    extCount = added['extensions']
+    if (extCount <= 0):
+        return dict([(kind, 0) for kind in added])
+
+    # Synthetic enum groups go after the last one, and extensions are
+    # numbered after the highest numbered one
+    groupIndex = list(root).index(groups[-1]) + 1
+    number = max([ int(ext.get('number')) for ext in extensions.findall('extension') ])
+
+    for ext in range(extCount):
+        number += 1
+        structCount = share(added['structs'], ext, extCount)
+        commandCount = share(added['commands'], ext, extCount)
+        valueCount = max(1, share(added['enum values'], ext, extCount))
+        extName = 'VK_SYN_scale_extension_%d' % ext
+        extension = etree.SubElement(extensions, 'extension',
+                                     { 'name' : extName,
+                                       'number' : str(number),
+                                       'type' : 'device',
+                                       'author' : 'SYN',
+                                       'contact' : 'genvk_scaler.py',
+                                       'supported' : 'vulkan' })
+        require = etree.SubElement(extension, 'require')
+        etree.SubElement(require, 'enum', { 'value' : '1',
+            'name' : 'VK_SYN_SCALE_EXTENSION_%d_SPEC_VERSION' % ext })
+        etree.SubElement(require, 'enum', { 'value' : '"%s"' % extName,
+            'name' : 'VK_SYN_SCALE_EXTENSION_%d_EXTENSION_NAME' % ext })
+
+        types.append(etree.fromstring(handleTemplate.format(ext=ext)))
+        types.append(etree.fromstring(enumTypeTemplate.format(ext=ext)))
+        etree.SubElement(require, 'type', { 'name' : 'VkSynObject%d' % ext })
+        etree.SubElement(require, 'type', { 'name' : 'VkSynMode%d' % ext })
+
+        group = etree.Element('enums', { 'name' : 'VkSynMode%d' % ext, 'type' : 'enum' })
+        for value in range(valueCount):
+            etree.SubElement(group, 'enum', { 'value' : str(value),
+                'name' : 'VK_SYN_MODE_%d_%d' % (ext, value) })
+        root.insert(groupIndex, group)
+        groupIndex += 1
+
+        for struct in range(structCount):
+            nextStruct = ''
+            if (struct + 1 < structCount):
+                nextStruct = ' validextensionstructs="VkSynInfo%d_%d"' % (ext, struct + 1)
+            previousMember = ''
+            if (struct > 0):
+                previousMember = previousMemberTemplate.format(ext=ext, previous=struct - 1)
+            types.append(etree.fromstring(structTemplate.format(ext=ext, struct=struct,
+                nextStruct=nextStruct, previousMember=previousMember)))
+            etree.SubElement(require, 'enum', { 'offset' : str(struct),
+                'extends' : 'VkStructureType',
+                'name' : 'VK_STRUCTURE_TYPE_SYN_INFO_%d_%d' % (ext, struct) })
+            etree.SubElement(require, 'type', { 'name' : 'VkSynInfo%d_%d' % (ext, struct) })
+
+        for command in range(commandCount):
+            infoParam = ''
+            if (structCount > 0):
+                infoParam = infoParamTemplate.format(ext=ext, struct=command % structCount)
+            commands.append(etree.fromstring(commandTemplate.format(ext=ext,
+                command=command, infoParam=infoParam)))
+            etree.SubElement(require, 'command', { 'name' : 'vkSynUpdate%d_%d' % (ext, command) })
+    return added
+
+# Write a copy of the registry file registry scaled by scale to output,
+# returning the dictionary of the number of each kind of item added
+def writeScaledRegistry(registry, scale, output):
+    tree = etree.parse(registry)
+    added = scaleRegistry(tree.getroot(), scale)
+    tree.write(output, encoding='utf-8', xml_declaration=True)
+    return added
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-registry', action='store',
+                        default='vk.xml',
+                        help='Use specified registry file instead of vk.xml')
+    parser.add_argument('-scale', action='store', type=float,
+                        default=2,
+                        help='Scale the registry by this factor')
+    parser.add_argument('-o', action='store', dest='output',
+                        required=True,
+                        help='Write the scaled registry to specified file')
+
+    args = parser.parse_args()
+
+    added = writeScaledRegistry(args.registry, args.scale, args.output)
+    for kind, count in added.items():
+        write('* Added', count, kind, file=sys.stderr)
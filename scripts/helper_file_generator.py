@@ -76,13 +76,12 @@ class HelperFileOutputGenerator(OutputGenerator):
                  diagFile = sys.stdout):
         OutputGenerator.__init__(self, errFile, warnFile, diagFile)
         # Internal state - accumulators for different inner block text
-        self.enum_output = ''                             # string built up of enum string routines
-        self.struct_size_h_output = ''                    # string built up of struct size header output
-        self.struct_size_c_output = ''                    # string built up of struct size source output
+        self.enum_output = Emitter()                      # Emitter accumulating enum string routines
         # Internal state - accumulators for different inner block text
         self.structNames = []                             # List of Vulkan struct typenames
         self.structTypes = dict()                         # Map of Vulkan struct typename to required VkStructureType
         self.structMembers = []                           # List of StructMemberData records for all Vulkan structs
+        self.structMemberDict = dict()                    # Map of Vulkan struct typename to its StructMemberData record
         # Named tuples to store struct and command data
         self.StructType = namedtuple('StructType', ['name', 'value'])
         self.CommandParam = namedtuple('CommandParam', ['type', 'name', 'ispointer', 'isstaticarray', 'isconst', 'iscount', 'len', 'extstructs', 'cdecl'])
@@ -94,38 +93,38 @@ class HelperFileOutputGenerator(OutputGenerator):
         # User-supplied prefix text, if any (list of strings)
         self.helper_file_type = genOpts.helper_file_type
         self.library_name = genOpts.library_name
+        out = self.outFile
         # File Comment
-        file_comment = '// *** THIS FILE IS GENERATED - DO NOT EDIT ***\n'
-        file_comment += '// See helper_file_generator.py for modifications\n'
-        write(file_comment, file=self.outFile)
+        out.lines(['// *** THIS FILE IS GENERATED - DO NOT EDIT ***',
+                   '// See helper_file_generator.py for modifications',
+                   ''])
         # Copyright Notice
-        copyright = ''
-        copyright += '\n'
-        copyright += '/***************************************************************************\n'
-        copyright += ' *\n'
-        copyright += ' * Copyright (c) 2015-2017 The Khronos Group Inc.\n'
-        copyright += ' * Copyright (c) 2015-2017 Valve Corporation\n'
-        copyright += ' * Copyright (c) 2015-2017 LunarG, Inc.\n'
-        copyright += ' * Copyright (c) 2015-2017 Google Inc.\n'
-        copyright += ' *\n'
-        copyright += ' * Licensed under the Apache License, Version 2.0 (the "License");\n'
-        copyright += ' * you may not use this file except in compliance with the License.\n'
-        copyright += ' * You may obtain a copy of the License at\n'
-        copyright += ' *\n'
-        copyright += ' *     http://www.apache.org/licenses/LICENSE-2.0\n'
-        copyright += ' *\n'
-        copyright += ' * Unless required by applicable law or agreed to in writing, software\n'
-        copyright += ' * distributed under the License is distributed on an "AS IS" BASIS,\n'
-        copyright += ' * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.\n'
-        copyright += ' * See the License for the specific language governing permissions and\n'
-        copyright += ' * limitations under the License.\n'
-        copyright += ' *\n'
-        copyright += ' * Author: Mark Lobodzinski <mark@lunarg.com>\n'
-        copyright += ' * Author: Courtney Goeltzenleuchter <courtneygo@google.com>\n'
-        copyright += ' * Author: Tobin Ehlis <tobine@google.com>\n'
-        copyright += ' *\n'
-        copyright += ' ****************************************************************************/\n'
-        write(copyright, file=self.outFile)
+        out.line()
+        out.lines(['/***************************************************************************',
+                   ' *',
+                   ' * Copyright (c) 2015-2017 The Khronos Group Inc.',
+                   ' * Copyright (c) 2015-2017 Valve Corporation',
+                   ' * Copyright (c) 2015-2017 LunarG, Inc.',
+                   ' * Copyright (c) 2015-2017 Google Inc.',
+                   ' *',
+                   ' * Licensed under the Apache License, Version 2.0 (the "License");',
+                   ' * you may not use this file except in compliance with the License.',
+                   ' * You may obtain a copy of the License at',
+                   ' *',
+                   ' *     http://www.apache.org/licenses/LICENSE-2.0',
+                   ' *',
+                   ' * Unless required by applicable law or agreed to in writing, software',
+                   ' * distributed under the License is distributed on an "AS IS" BASIS,',
+                   ' * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.',
+                   ' * See the License for the specific language governing permissions and',
+                   ' * limitations under the License.',
+                   ' *',
+                   ' * Author: Mark Lobodzinski <mark@lunarg.com>',
+                   ' * Author: Courtney Goeltzenleuchter <courtneygo@google.com>',
+                   ' * Author: Tobin Ehlis <tobine@google.com>',
+                   ' *',
+                   ' ****************************************************************************/',
+                   ''])
     #
     # Write generated file content to output file
     def endFile(self):
@@ -141,24 +140,22 @@ class HelperFileOutputGenerator(OutputGenerator):
     # Grab group (e.g. C "enum" type) info to output for enum-string conversion helper
     def genGroup(self, groupinfo, groupName):
         OutputGenerator.genGroup(self, groupinfo, groupName)
-        groupElem = groupinfo.elem
         # For enum_string_header
         if self.helper_file_type == 'enum_string_header':
             value_list = []
-            for elem in groupElem.findall('enum'):
-                if elem.get('supported') != 'disabled':
-                    item_name = elem.get('name')
+            for enuminfo in groupinfo.enums:
+                if enuminfo.supported != 'disabled':
+                    item_name = enuminfo.name
                     value_list.append(item_name)
             if value_list is not None:
-                self.enum_output += self.GenerateEnumStringConversion(groupName, value_list)
+                self.GenerateEnumStringConversion(groupName, value_list, self.enum_output)
     #
     # Called for each type -- if the type is a struct/union, grab the metadata
     def genType(self, typeinfo, name):
         OutputGenerator.genType(self, typeinfo, name)
-        typeElem = typeinfo.elem
         # If the type is a struct type, traverse the imbedded <member> tags generating a structure.
         # Otherwise, emit the tag text.
-        category = typeElem.get('category')
+        category = typeinfo.category
         if (category == 'struct' or category == 'union'):
             self.structNames.append(name)
             self.genStruct(typeinfo, name)
@@ -172,32 +169,6 @@ class HelperFileOutputGenerator(OutputGenerator):
         # Add STRUCTURE_TYPE_
         return re.sub('VK_', 'VK_STRUCTURE_TYPE_', value)
     #
-    # Check if the parameter passed in is a pointer
-    def paramIsPointer(self, param):
-        ispointer = False
-        for elem in param:
-            if ((elem.tag is not 'type') and (elem.tail is not None)) and '*' in elem.tail:
-                ispointer = True
-        return ispointer
-    #
-    # Check if the parameter passed in is a static array
-    def paramIsStaticArray(self, param):
-        isstaticarray = 0
-        paramname = param.find('name')
-        if (paramname.tail is not None) and ('[' in paramname.tail):
-            isstaticarray = paramname.tail.count('[')
-        return isstaticarray
-    #
-    # Retrieve the type and name for a parameter
-    def getTypeNameTuple(self, param):
-        type = ''
-        name = ''
-        for elem in param:
-            if elem.tag == 'type':
-                type = noneStr(elem.text)
-            elif elem.tag == 'name':
-                name = noneStr(elem.text)
-        return (type, name)
     # Extract length values from latexmath.  Currently an inflexible solution that looks for specific
     # patterns that are found in vk.xml.  Will need to be updated when new patterns are introduced.
     def parseLateXMath(self, source):
@@ -217,23 +188,14 @@ class HelperFileOutputGenerator(OutputGenerator):
             decoratedName = '{}/{}'.format(*match.group(1, 2))
         return name, decoratedName
     #
-    # Retrieve the value of the len tag
+    # Retrieve the value of the len tag, with any latexmath expression
+    # converted to C
     def getLen(self, param):
-        result = None
-        len = param.attrib.get('len')
-        if len and len != 'null-terminated':
-            # For string arrays, 'len' can look like 'count,null-terminated', indicating that we
-            # have a null terminated array of strings.  We strip the null-terminated from the
-            # 'len' field and only return the parameter specifying the string count
-            if 'null-terminated' in len:
-                result = len.split(',')[0]
-            else:
-                result = len
-            if 'latexmath' in len:
-                param_type, param_name = self.getTypeNameTuple(param)
-                len_name, result = self.parseLateXMath(len)
+        result = param.len
+        if result and 'latexmath' in param.rawLen:
+            len_name, result = self.parseLateXMath(param.rawLen)
             # Spec has now notation for len attributes, using :: instead of platform specific pointer symbol
-            result = str(result).replace('::', '->')
+            result = result.replace('::', '->')
         return result
     #
     # Check if a structure is or contains a dispatchable (dispatchable = True) or 
@@ -243,77 +205,75 @@ class HelperFileOutputGenerator(OutputGenerator):
             type_key = 'VK_DEFINE_HANDLE'
         else:
             type_key = 'VK_DEFINE_NON_DISPATCHABLE_HANDLE'
-        handle = self.registry.tree.find("types/type/[name='" + handle_type + "'][@category='handle']")
-        if handle is not None and handle.find('type').text == type_key:
+        handle = self.registry.handledict.get(handle_type)
+        if handle is not None and handle.define == type_key:
             return True
         # if handle_type is a struct, search its members
         if handle_type in self.structNames:
-            member_index = next((i for i, v in enumerate(self.structMembers) if v[0] == handle_type), None)
-            if member_index is not None:
-                for item in self.structMembers[member_index].members:
-                    handle = self.registry.tree.find("types/type/[name='" + item.type + "'][@category='handle']")
-                    if handle is not None and handle.find('type').text == type_key:
+            struct = self.structMemberDict.get(handle_type)
+            if struct is not None:
+                for item in struct.members:
+                    handle = self.registry.handledict.get(item.type)
+                    if handle is not None and handle.define == type_key:
                         return True
         return False
     #
     # Generate local ready-access data describing Vulkan structures and unions from the XML metadata
     def genStruct(self, typeinfo, typeName):
         OutputGenerator.genStruct(self, typeinfo, typeName)
-        members = typeinfo.elem.findall('.//member')
+        layout = typeinfo.layout
         # Iterate over members once to get length parameters for arrays
         lens = set()
-        for member in members:
+        for member in layout.members:
             len = self.getLen(member)
             if len:
                 lens.add(len)
+        # Process VkStructureType
+        if layout.stypeMember is not None:
+            # The required struct type value, from the sType member's
+            # 'values' attribute
+            value = layout.stype
+            if value is None:
+                value = self.genVkStructureType(typeName)
+            # Store the required type value
+            self.structTypes[typeName] = self.StructType(name=layout.stypeMember, value=value)
         # Generate member info
         membersInfo = []
-        for member in members:
-            # Get the member's type and name
-            info = self.getTypeNameTuple(member)
-            type = info[0]
-            name = info[1]
-            cdecl = self.makeCParamDecl(member, 1)
-            # Process VkStructureType
-            if type == 'VkStructureType':
-                # Extract the required struct type value from the comments
-                # embedded in the original text defining the 'typeinfo' element
-                rawXml = etree.tostring(typeinfo.elem).decode('ascii')
-                result = re.search(r'VK_STRUCTURE_TYPE_\w+', rawXml)
-                if result:
-                    value = result.group(0)
-                else:
-                    value = self.genVkStructureType(typeName)
-                # Store the required type value
-                self.structTypes[typeName] = self.StructType(name=name, value=value)
+        for member in layout.members:
+            name = member.name
+            cdecl = member.alignedCDecl(1)
             # Store pointer/array/string info
-            isstaticarray = self.paramIsStaticArray(member)
-            membersInfo.append(self.CommandParam(type=type,
+            membersInfo.append(self.CommandParam(type=member.type,
                                                  name=name,
-                                                 ispointer=self.paramIsPointer(member),
-                                                 isstaticarray=isstaticarray,
+                                                 ispointer=member.tailPointer,
+                                                 isstaticarray=member.staticArray,
                                                  isconst=True if 'const' in cdecl else False,
                                                  iscount=True if name in lens else False,
                                                  len=self.getLen(member),
-                                                 extstructs=member.attrib.get('validextensionstructs') if name == 'pNext' else None,
+                                                 extstructs=member.extstructs if name == 'pNext' else None,
                                                  cdecl=cdecl))
-        self.structMembers.append(self.StructMemberData(name=typeName, members=membersInfo, ifdef_protect=self.featureExtraProtect))
+        struct = self.StructMemberData(name=typeName, members=membersInfo, ifdef_protect=self.featureExtraProtect)
+        self.structMembers.append(struct)
+        self.structMemberDict.setdefault(typeName, struct)
     #
     # Enum_string_header: Create a routine to convert an enumerated value into a string
-    def GenerateEnumStringConversion(self, groupName, value_list):
-        outstring = '\n'
-        outstring += 'static inline const char* string_%s(%s input_value)\n' % (groupName, groupName)
-        outstring += '{\n'
-        outstring += '    switch ((%s)input_value)\n' % groupName
-        outstring += '    {\n'
+    def GenerateEnumStringConversion(self, groupName, value_list, out):
+        out.line()
+        out.line('static inline const char* string_%s(%s input_value)' % (groupName, groupName))
+        out.line('{')
+        out.indent()
+        out.line('switch ((%s)input_value)' % groupName)
+        out.line('{')
+        out.indent()
         for item in value_list:
-            outstring += '        case %s:\n' % item
-            outstring += '            return "%s";\n' % item
-        outstring += '        default:\n'
-        outstring += '            return "Unhandled %s";\n' % groupName
-        outstring += '    }\n'
-        outstring += '}\n'
-        return outstring
+            out.line('case %s:' % item)
+            out.line('    return "%s";' % item)
+        out.line('default:')
+        out.line('    return "Unhandled %s";' % groupName)
+        out.dedent()
+        out.line('}')
+        out.dedent()
+        out.line('}')
     #
     # Combine enum string helper header file preamble with body text and return
     def GenerateEnumStringHelperHeader(self):
@@ -325,12 +285,12 @@ class HelperFileOutputGenerator(OutputGenerator):
             enum_string_helper_header += '\n'
             enum_string_helper_header += '#include <vulkan/vulkan.h>\n'
             enum_string_helper_header += '\n'
-            enum_string_helper_header += self.enum_output
+            enum_string_helper_header += self.enum_output.getvalue()
             return enum_string_helper_header
     #
     # struct_size_header: build function prototypes for header file
     def GenerateStructSizeHeader(self):
-        outstring = ''
+        outstring = Emitter()
         outstring += 'size_t get_struct_chain_size(const void* struct_ptr);\n'
         for item in self.structMembers:
             lower_case_name = item.name.lower()
@@ -342,7 +302,7 @@ class HelperFileOutputGenerator(OutputGenerator):
         outstring += '#ifdef __cplusplus\n'
         outstring += '}\n'
         outstring += '#endif'
-        return outstring
+        return outstring.getvalue()
     #
     # Combine struct size helper header file preamble with body text and return
     def GenerateStructSizeHelperHeader(self):
@@ -391,8 +351,9 @@ class HelperFileOutputGenerator(OutputGenerator):
     # struct_size_helper source -- create bodies of struct size helper functions
     def GenerateStructSizeSource(self):
         # Construct the body of the routine and get_struct_chain_size() simultaneously
-        struct_size_body = ''
-        chain_size  = self.GenerateChainSizePreamble()
+        struct_size_body = Emitter()
+        chain_size = Emitter()
+        chain_size += self.GenerateChainSizePreamble()
         for item in self.structMembers:
             struct_size_body += '\n'
             lower_case_name = item.name.lower()
@@ -410,7 +371,7 @@ class HelperFileOutputGenerator(OutputGenerator):
             struct_size_body += '        struct_size = sizeof(%s);\n' % item.name
             counter_declared = False
             for member in item.members:
-                vulkan_type = next((i for i, v in enumerate(self.structMembers) if v[0] == member.type), None)
+                vulkan_type = self.structMemberDict.get(member.type)
                 if member.ispointer == True:
                     if vulkan_type is not None:
                         # If this is another Vulkan structure call generated size function
@@ -445,8 +406,8 @@ class HelperFileOutputGenerator(OutputGenerator):
                 struct_size_body += '#endif // %s\n' % item.ifdef_protect
                 chain_size += '#endif // %s\n' % item.ifdef_protect
         chain_size += self.GenerateChainSizePostamble()
-        struct_size_body += chain_size;
-        return struct_size_body
+        struct_size_body += chain_size.getvalue()
+        return struct_size_body.getvalue()
     #
     # Combine struct size helper source file preamble with body text and return
     def GenerateStructSizeHelperSource(self):
@@ -470,7 +431,7 @@ class HelperFileOutputGenerator(OutputGenerator):
     #
     # safe_struct header: build function prototypes for header file
     def GenerateSafeStructHeader(self):
-        safe_struct_header = ''
+        safe_struct_header = Emitter()
         for item in self.structMembers:
             if self.NeedSafeStruct(item) == True:
                 safe_struct_header += '\n'
@@ -479,8 +440,8 @@ class HelperFileOutputGenerator(OutputGenerator):
                 safe_struct_header += 'struct safe_%s {\n' % (item.name)
                 for member in item.members:
                     if member.type in self.structNames:
-                        member_index = next((i for i, v in enumerate(self.structMembers) if v[0] == member.type), None)
-                        if member_index is not None and self.NeedSafeStruct(self.structMembers[member_index]) == True:
+                        struct = self.structMemberDict.get(member.type)
+                        if struct is not None and self.NeedSafeStruct(struct) == True:
                             if member.ispointer:
                                 safe_struct_header += '    safe_%s* %s;\n' % (member.type, member.name)
                             else:
@@ -501,7 +462,7 @@ class HelperFileOutputGenerator(OutputGenerator):
                 safe_struct_header += '};\n'
                 if item.ifdef_protect != None:
                     safe_struct_header += '#endif // %s\n' % item.ifdef_protect
-        return safe_struct_header
+        return safe_struct_header.getvalue()
     #
     # Determine if a structure needs a safe_struct helper function
     # That is, it has an sType or one of its members is a pointer
@@ -578,8 +539,8 @@ class HelperFileOutputGenerator(OutputGenerator):
             for member in item.members:
                 m_type = member.type
                 if member.type in self.structNames:
-                    member_index = next((i for i, v in enumerate(self.structMembers) if v[0] == member.type), None)
-                    if member_index is not None and self.NeedSafeStruct(self.structMembers[member_index]) == True:
+                    struct = self.structMemberDict.get(member.type)
+                    if struct is not None and self.NeedSafeStruct(struct) == True:
                         m_type = 'safe_%s' % member.type
                 if member.ispointer and 'safe_' not in m_type and self.TypeContainsObjectHandle(member.type, False) == False:
                     # Ptr types w/o a safe_struct, for non-null case need to allocate new ptr and copy data in
@@ -619,8 +580,8 @@ class HelperFileOutputGenerator(OutputGenerator):
                         init_func_txt += '    %s = nullptr;\n' % member.name
                         array_element = 'in_struct->%s[i]' % member.name
                         if member.type in self.structNames:
-                            member_index = next((i for i, v in enumerate(self.structMembers) if v[0] == member.type), None)
-                            if member_index is not None and self.NeedSafeStruct(self.structMembers[member_index]) == True:
+                            struct = self.structMemberDict.get(member.type)
+                            if struct is not None and self.NeedSafeStruct(struct) == True:
                                 array_element = '%s(&in_struct->safe_%s[i])' % (member.type, member.name)
                         construct_txt += '    if (%s && in_struct->%s) {\n' % (member.len, member.name)
                         construct_txt += '        %s = new %s[%s];\n' % (member.name, m_type, member.len)
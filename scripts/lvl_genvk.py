@@ -15,46 +15,214 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import argparse, cProfile, pdb, string, sys, time
+import argparse, hashlib, os, string, sys, time
 from reg import *
 from generator import write
 
-#
-# LoaderAndValidationLayer Generator Additions
-from threading_generator import  ThreadGeneratorOptions, ThreadOutputGenerator
-from parameter_validation_generator import ParamCheckerGeneratorOptions, ParamCheckerOutputGenerator
-from unique_objects_generator import UniqueObjectsGeneratorOptions, UniqueObjectsOutputGenerator
-from dispatch_table_generator import DispatchTableOutputGenerator, DispatchTableOutputGeneratorOptions
-from helper_file_generator import HelperFileOutputGenerator, HelperFileOutputGeneratorOptions
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
 
 # Simple timer functions
 startTime = None
 
 def startTimer(timeit):
     global startTime
-    startTime = time.clock()
+    startTime = time.perf_counter()
 
 def endTimer(timeit, msg):
     global startTime
-    endTime = time.clock()
+    endTime = time.perf_counter()
     if (timeit):
         write(msg, endTime - startTime, file=sys.stderr)
         startTime = None
 
+# Peak resident set size of this process in KB, or None if unknown
+def peakRSS():
+    if (resource == None):
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if (sys.platform == 'darwin'):
+        # Reported in bytes, rather than KB
+        rss //= 1024
+    return rss
+
+# Hashes of file contents, keyed by file name
+sourceHashes = {}
+
+# Hash of a file's contents, computed once per file
+def sourceHash(filename):
+    if (filename not in sourceHashes):
+        with open(filename, 'rb') as f:
+            sourceHashes[filename] = hashlib.sha256(f.read()).hexdigest()
+    return sourceHashes[filename]
+
+# Hash of everything that determines the text generated for a target: the
+# Python version, the sources of reg.py, generator.py and the target's
+# generator module, the generator class, the target's options, and
+# registryHash - a hash of the registry, or of the part of it the target is
+# generated from. The output directory is not included, as it doesn't
+# affect the generated text.
+def targetHash(createGenerator, options, registryHash):
+    hash = hashlib.sha256()
+    hash.update(sys.version.encode('utf-8'))
+    hash.update(registryHash.encode('utf-8'))
+    for module in [ 'reg', 'generator', createGenerator.__module__ ]:
+        hash.update(sourceHash(sys.modules[module].__file__).encode('utf-8'))
+    hash.update(createGenerator.__qualname__.encode('utf-8'))
+    for name, value in sorted(vars(options).items()):
+        if (name == 'directory'):
+            continue
+        if callable(value):
+            value = value.__module__ + '.' + value.__qualname__
+        hash.update(('\0' + name + '=' + repr(value)).encode('utf-8'))
+    return hash.hexdigest()
+
+# Remove a file, if it exists
+def removeFile(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+
+# Generated output cache - generated files stored under their targetHash()
+# for the whole registry XML. On a hit the stored file is copied into place
+# and the target is not generated at all. Once the cache grows past maxSize
+# bytes, the least recently used files are evicted.
+class OutputCache:
+    cachePrefix = 'vkoutput-'
+    def __init__(self, cacheDir, registryFile, maxSize):
+        self.cacheDir = cacheDir
+        self.maxSize = maxSize
+        self.registryHash = sourceHash(registryFile)
+    # Cache file name for a target's generator class and options
+    def cacheFileName(self, createGenerator, options):
+        return os.path.join(self.cacheDir, self.cachePrefix +
+                            targetHash(createGenerator, options, self.registryHash))
+    # Copy the cached output for a target into place. Returns True if
+    # successful. As with OutputGenerator.writeIfChanged(), an existing
+    # file with the same content is left untouched.
+    def fetch(self, createGenerator, options):
+        cachename = self.cacheFileName(createGenerator, options)
+        try:
+            with open(cachename, 'rb') as f:
+                contents = f.read()
+            # Mark the entry as recently used
+            os.utime(cachename)
+        except OSError:
+            return False
+        filename = options.directory + '/' + options.filename
+        try:
+            with open(filename, 'rb') as f:
+                if (f.read() == contents):
+                    return True
+        except OSError:
+            pass
+        tmpname = filename + '.' + str(os.getpid()) + '.tmp'
+        try:
+            with open(tmpname, 'wb') as f:
+                f.write(contents)
+            os.replace(tmpname, filename)
+        except OSError as e:
+            # Generate the target instead, which reports the problem
+            # itself if it persists
+            write('*** Unable to copy output cache entry to', filename, ':', e,
+                  file=sys.stderr)
+            removeFile(tmpname)
+            return False
+        return True
+    # Store the output just generated for a target, then evict old entries
+    def store(self, createGenerator, options):
+        import tempfile
+        cachename = self.cacheFileName(createGenerator, options)
+        filename = options.directory + '/' + options.filename
+        tmpname = None
+        try:
+            with open(filename, 'rb') as f:
+                contents = f.read()
+            if not os.path.exists(self.cacheDir):
+                os.makedirs(self.cacheDir)
+            # Write to a temporary file and rename it into place, so that
+            # concurrent builds never see a partially written entry
+            (fd, tmpname) = tempfile.mkstemp(dir=self.cacheDir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(contents)
+            os.replace(tmpname, cachename)
+            tmpname = None
+            self.evict()
+        except OSError as e:
+            write('*** Unable to write output cache', cachename, ':', e,
+                  file=sys.stderr)
+            if (tmpname != None):
+                removeFile(tmpname)
+    # Remove the least recently used entries until the cache fits in maxSize
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cacheDir):
+            if not name.startswith(self.cachePrefix):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cacheDir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        size = sum(entry[1] for entry in entries)
+        for mtime, entrySize, name in sorted(entries):
+            if (size <= self.maxSize):
+                break
+            try:
+                os.remove(os.path.join(self.cacheDir, name))
+            except OSError:
+                # Already evicted by a concurrent build
+                pass
+            size -= entrySize
+
 # Turn a list of strings into a regexp string matching exactly those strings
 def makeREstring(list):
     return '^(' + '|'.join(list) + ')$'
 
-# Returns a directory of [ generator function, generator options ] indexed
-# by specified short names. The generator options incorporate the following
-# parameters:
+# Registry of generation targets - maps each target name to a
+# [ generator class, generator options ] pair, like a dictionary. Targets
+# are added with the names of their LoaderAndValidationLayer generator
+# module and classes, and the module is only imported, and the options only
+# constructed, when the target is first looked up. A run which builds a
+# single target doesn't pay for loading every generator.
+class TargetRegistry:
+    def __init__(self):
+        self.targets = {}
+    # Add a target generated by generatorName in module, with an instance of
+    # optionsName constructed from the keyword arguments as its options
+    def add(self, name, module, generatorName, optionsName, **options):
+        self.targets[name] = (module, generatorName, optionsName, options)
+    def __getitem__(self, name):
+        target = self.targets[name]
+        if isinstance(target, tuple):
+            import importlib
+            (module, generatorName, optionsName, options) = target
+            module = importlib.import_module(module)
+            target = [ getattr(module, generatorName),
+                       getattr(module, optionsName)(**options) ]
+            self.targets[name] = target
+        return target
+    def __contains__(self, name):
+        return name in self.targets
+    def __iter__(self):
+        return iter(self.targets)
+    def keys(self):
+        return self.targets.keys()
+
+# Returns a TargetRegistry of [ generator function, generator options ]
+# indexed by specified short names. The generator options incorporate the
+# following parameters:
 #
 # extensions - list of extension names to include.
 # protect - True if re-inclusion protection should be added to headers
 # directory - path to directory in which to generate the target(s)
 def makeGenOpts(extensions = [], removeExtensions = [], protect = True, directory = '.'):
     global genOpts
-    genOpts = {}
+    genOpts = TargetRegistry()
 
     # Descriptive names for various regexp patterns used to select
     # versions and extensions
@@ -101,9 +269,8 @@ def makeGenOpts(extensions = [], removeExtensions = [], protect = True, director
     #
     # LoaderAndValidationLayer Generators
     # Options for threading layer
-    genOpts['thread_check.h'] = [
-          ThreadOutputGenerator,
-          ThreadGeneratorOptions(
+    genOpts.add('thread_check.h', 'threading_generator',
+          'ThreadOutputGenerator', 'ThreadGeneratorOptions',
             filename          = 'thread_check.h',
             directory         = directory,
             apiname           = 'vulkan',
@@ -119,12 +286,10 @@ def makeGenOpts(extensions = [], removeExtensions = [], protect = True, director
             apientry          = 'VKAPI_CALL ',
             apientryp         = 'VKAPI_PTR *',
             alignFuncParam    = 48)
-        ]
 
     # Options for parameter validation layer
-    genOpts['parameter_validation.h'] = [
-          ParamCheckerOutputGenerator,
-          ParamCheckerGeneratorOptions(
+    genOpts.add('parameter_validation.h', 'parameter_validation_generator',
+          'ParamCheckerOutputGenerator', 'ParamCheckerGeneratorOptions',
             filename          = 'parameter_validation.h',
             directory         = directory,
             apiname           = 'vulkan',
@@ -140,12 +305,10 @@ def makeGenOpts(extensions = [], removeExtensions = [], protect = True, director
             apientry          = 'VKAPI_CALL ',
             apientryp         = 'VKAPI_PTR *',
             alignFuncParam    = 48)
-        ]
 
     # Options for unique objects layer
-    genOpts['unique_objects_wrappers.h'] = [
-          UniqueObjectsOutputGenerator,
-          UniqueObjectsGeneratorOptions(
+    genOpts.add('unique_objects_wrappers.h', 'unique_objects_generator',
+          'UniqueObjectsOutputGenerator', 'UniqueObjectsGeneratorOptions',
             filename          = 'unique_objects_wrappers.h',
             directory         = directory,
             apiname           = 'vulkan',
@@ -161,13 +324,11 @@ def makeGenOpts(extensions = [], removeExtensions = [], protect = True, director
             apientry          = 'VKAPI_CALL ',
             apientryp         = 'VKAPI_PTR *',
             alignFuncParam    = 48)
-        ]
 
 
     # Options for dispatch table helper generator
-    genOpts['vk_dispatch_table_helper.h'] = [
-          DispatchTableOutputGenerator,
-          DispatchTableOutputGeneratorOptions(
+    genOpts.add('vk_dispatch_table_helper.h', 'dispatch_table_generator',
+          'DispatchTableOutputGenerator', 'DispatchTableOutputGeneratorOptions',
             filename          = 'vk_dispatch_table_helper.h',
             directory         = directory,
             apiname           = 'vulkan',
@@ -183,12 +344,10 @@ def makeGenOpts(extensions = [], removeExtensions = [], protect = True, director
             apientry          = 'VKAPI_CALL ',
             apientryp         = 'VKAPI_PTR *',
             alignFuncParam    = 48)
-        ]
 
     # Helper file generator options for vk_enum_string_helper.h
-    genOpts['vk_enum_string_helper.h'] = [
-          HelperFileOutputGenerator,
-          HelperFileOutputGeneratorOptions(
+    genOpts.add('vk_enum_string_helper.h', 'helper_file_generator',
+          'HelperFileOutputGenerator', 'HelperFileOutputGeneratorOptions',
             filename          = 'vk_enum_string_helper.h',
             directory         = directory,
             apiname           = 'vulkan',
@@ -205,12 +364,10 @@ def makeGenOpts(extensions = [], removeExtensions = [], protect = True, director
             apientryp         = 'VKAPI_PTR *',
             alignFuncParam    = 48,
             helper_file_type  = 'enum_string_header')
-        ]
 
     # Helper file generator options for vk_struct_size_helper.h
-    genOpts['vk_struct_size_helper.h'] = [
-          HelperFileOutputGenerator,
-          HelperFileOutputGeneratorOptions(
+    genOpts.add('vk_struct_size_helper.h', 'helper_file_generator',
+          'HelperFileOutputGenerator', 'HelperFileOutputGeneratorOptions',
             filename          = 'vk_struct_size_helper.h',
             directory         = directory,
             apiname           = 'vulkan',
@@ -227,12 +384,10 @@ def makeGenOpts(extensions = [], removeExtensions = [], protect = True, director
             apientryp         = 'VKAPI_PTR *',
             alignFuncParam    = 48,
             helper_file_type  = 'struct_size_header')
-        ]
 
     # Helper file generator options for vk_struct_size_helper.c
-    genOpts['vk_struct_size_helper.c'] = [
-          HelperFileOutputGenerator,
-          HelperFileOutputGeneratorOptions(
+    genOpts.add('vk_struct_size_helper.c', 'helper_file_generator',
+          'HelperFileOutputGenerator', 'HelperFileOutputGeneratorOptions',
             filename          = 'vk_struct_size_helper.c',
             directory         = directory,
             apiname           = 'vulkan',
@@ -249,12 +404,10 @@ def makeGenOpts(extensions = [], removeExtensions = [], protect = True, director
             apientryp         = 'VKAPI_PTR *',
             alignFuncParam    = 48,
             helper_file_type  = 'struct_size_source')
-        ]
 
     # Helper file generator options for vk_safe_struct.h
-    genOpts['vk_safe_struct.h'] = [
-          HelperFileOutputGenerator,
-          HelperFileOutputGeneratorOptions(
+    genOpts.add('vk_safe_struct.h', 'helper_file_generator',
+          'HelperFileOutputGenerator', 'HelperFileOutputGeneratorOptions',
             filename          = 'vk_safe_struct.h',
             directory         = directory,
             apiname           = 'vulkan',
@@ -271,12 +424,10 @@ def makeGenOpts(extensions = [], removeExtensions = [], protect = True, director
             apientryp         = 'VKAPI_PTR *',
             alignFuncParam    = 48,
             helper_file_type  = 'safe_struct_header')
-        ]
 
     # Helper file generator options for vk_safe_struct.cpp
-    genOpts['vk_safe_struct.cpp'] = [
-          HelperFileOutputGenerator,
-          HelperFileOutputGeneratorOptions(
+    genOpts.add('vk_safe_struct.cpp', 'helper_file_generator',
+          'HelperFileOutputGenerator', 'HelperFileOutputGeneratorOptions',
             filename          = 'vk_safe_struct.cpp',
             directory         = directory,
             apiname           = 'vulkan',
@@ -293,31 +444,93 @@ def makeGenOpts(extensions = [], removeExtensions = [], protect = True, director
             apientryp         = 'VKAPI_PTR *',
             alignFuncParam    = 48,
             helper_file_type  = 'safe_struct_source')
-        ]
 
 
 
-# Generate a target based on the options in the matching genOpts{} object.
-# This is encapsulated in a function so it can be profiled and/or timed.
-# The args parameter is an parsed argument object containing the following
-# fields that are used:
-#   target - target to generate
-#   directory - directory to generate it in
-#   protect - True if re-inclusion wrappers should be created
-#   extensions - list of additional extensions to include in generated
-#   interfaces
-def genTarget(args):
-    global genOpts
+# Target fingerprints - the targetHash() of a target for the part of the
+# registry it is generated from (see Registry.interfaceHash()), stored next
+# to the generated file. A target whose fingerprint is unchanged would be
+# generated exactly as before, so it needn't be generated again.
+def fingerprintFileName(options):
+    return options.directory + '/' + options.filename + '.fingerprint'
+
+# Return the stored fingerprint for a target, or None if there is none or
+# the generated file is missing
+def readFingerprint(options):
+    if not os.path.exists(options.directory + '/' + options.filename):
+        return None
+    try:
+        with open(fingerprintFileName(options), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+# Return the set of source files of the modules imported from the
+# directory containing reg.py, including this script
+def scriptModuleFiles():
+    scriptsDir = os.path.dirname(os.path.abspath(sys.modules['reg'].__file__))
+    files = set()
+    for module in list(sys.modules.values()):
+        filename = getattr(module, '__file__', None)
+        if (filename and os.path.dirname(os.path.abspath(filename)) == scriptsDir):
+            files.add(os.path.abspath(filename))
+    return files
+
+# Write a Make / Ninja depfile naming the files generated for a list of
+# target options as depending on the registry and on every module imported
+# from the directory containing reg.py
+def writeDepfile(depfile, optionsList, registry):
+    deps = scriptModuleFiles()
+    deps.add(os.path.abspath(registry))
+    # Escape spaces, which otherwise separate file names
+    outputs = [ (options.directory + '/' + options.filename).replace(' ', '\\ ')
+                for options in optionsList ]
+    with open(depfile, 'w', encoding='utf-8') as f:
+        f.write(' '.join(outputs) + ':')
+        for dep in sorted(deps):
+            f.write(' \\\n  ' + dep.replace(' ', '\\ '))
+        f.write('\n')
+
+# The parsed registry, loaded by loadRegistry() when first needed
+reg = None
+
+# Load & parse the registry named by args.registry, from the registry cache
+# if one is given and valid
+def loadRegistry(args):
+    global reg
+    if (reg != None):
+        return
+    reg = Registry()
 
-    # Create generator options with specified parameters
-    makeGenOpts(extensions = args.extension,
-                removeExtensions = args.removeExtension,
-                protect = args.protect,
-                directory = args.directory)
+    startTimer(args.time)
+    if (args.cache and reg.loadCache(args.registry, args.cache)):
+        endTimer(args.time, '* Time to load registry cache =')
+    else:
+        if (args.stream):
+            tree = reg.parseFileStream(args.registry)
+        else:
+            tree = etree.parse(args.registry)
+        endTimer(args.time, '* Time to make ElementTree =')
+        if (args.time and peakRSS() != None):
+            write('* Peak RSS after making ElementTree =', peakRSS(), 'KB',
+                  file=sys.stderr)
 
-    if (args.target in genOpts.keys()):
-        createGenerator = genOpts[args.target][0]
-        options = genOpts[args.target][1]
+        startTimer(args.time)
+        reg.loadElementTree(tree)
+        endTimer(args.time, '* Time to parse ElementTree =')
+
+        if (args.cache):
+            reg.saveCache(args.registry, args.cache)
+
+# Generate a single target from the already-parsed registry, using the
+# options in the matching genOpts{} object. The registry is reset afterwards
+# so no required/declared state leaks into the next target. If an output
+# cache is given, the generated file is stored in it, and if a fingerprint
+# is given, it's written next to the generated file.
+def genOneTarget(args, target, cache = None, fingerprint = None):
+    if (target in genOpts.keys()):
+        createGenerator = genOpts[target][0]
+        options = genOpts[target][1]
 
         if not args.quiet:
             write('* Building', options.filename, file=sys.stderr)
@@ -328,17 +541,317 @@ def genTarget(args):
                               diagFile=diag)
         reg.setGenerator(gen)
         reg.apiGen(options)
+        reg.apiReset()
+        if (cache):
+            cache.store(createGenerator, options)
+        if (fingerprint):
+            with open(fingerprintFileName(options), 'w', encoding='utf-8') as f:
+                f.write(fingerprint + '\n')
 
         if not args.quiet:
             write('* Generated', options.filename, file=sys.stderr)
         endTimer(args.time, '* Time to generate ' + options.filename + ' =')
     else:
         write('No generator options for unknown target:',
-              args.target, file=sys.stderr)
+              target, file=sys.stderr)
+
+# Name of the file a worker logs the index'th target's errors and warnings
+# (kind 'err') or diagnostics (kind 'diag') to
+def logFileName(logDir, index, kind):
+    return os.path.join(logDir, '%d.%s' % (index, kind))
+
+# Generate the index'th target in a worker process, logging to files of
+# its own in logDir instead of the -errfile / -diagfile shared with other
+# workers. Errors and warnings still go to stderr without -errfile.
+def genOneTargetLogged(args, target, cache, fingerprint, logDir, index):
+    global errWarn, diag
+    if (args.errfile):
+        errWarn = open(logFileName(logDir, index, 'err'), 'w', encoding='utf-8')
+    if (diag):
+        diag = open(logFileName(logDir, index, 'diag'), 'w', encoding='utf-8')
+    try:
+        genOneTarget(args, target, cache, fingerprint)
+    finally:
+        if (args.errfile):
+            errWarn.close()
+        if (diag):
+            diag.close()
+
+# Append the contents of a worker's log file, if it wrote one, to logFile
+def appendLog(logFile, filename):
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            logFile.write(f.read())
+    except OSError:
+        pass
+
+# Generate targets based on the options in the matching genOpts{} objects.
+# This is encapsulated in a function so it can be profiled and/or timed.
+# The args parameter is an parsed argument object containing the following
+# fields that are used:
+#   target - list of targets to generate, or 'all' for every target
+#   directory - directory to generate it in
+#   protect - True if re-inclusion wrappers should be created
+#   extensions - list of additional extensions to include in generated
+#   interfaces
+#   jobs - number of targets to generate concurrently
+#   outputcache - directory of the generated output cache, if any
+#   fingerprint - True if targets with an unchanged fingerprint are skipped
+#   depfile - name of the depfile to write, if any
+# Targets found in the output cache are copied from it, and the registry is
+# only loaded if some target still has to be generated.
+# All targets are generated from the same parsed registry. With more than
+# one job, each target is generated in a worker process forked from this
+# one, which shares the parsed registry copy-on-write; the output is the
+# same as generating the targets one after another.
+def genTarget(args):
+    global genOpts
+
+    # Create generator options with specified parameters
+    makeGenOpts(extensions = args.extension,
+                removeExtensions = args.removeExtension,
+                protect = args.protect,
+                directory = args.directory)
 
+    targets = []
+    for target in args.target:
+        names = genOpts.keys() if target == 'all' else [target]
+        targets += [name for name in names if name not in targets]
+    if not targets:
+        write('No target specified', file=sys.stderr)
+
+    generateTargets(args, list(targets))
+
+    # Written last, so that it lists every module that was imported
+    if (args.depfile):
+        writeDepfile(args.depfile,
+                     [genOpts[target][1] for target in targets if target in genOpts.keys()],
+                     args.registry)
+
+# Generate a list of targets, skipping those found in the output cache or
+# with an unchanged fingerprint
+def generateTargets(args, targets):
+    cache = None
+    if (args.outputcache):
+        cache = OutputCache(args.outputcache, args.registry,
+                            args.outputcachesize * 1024 * 1024)
+        for target in [target for target in targets if target in genOpts.keys()]:
+            createGenerator, options = genOpts[target]
+            if (cache.fetch(createGenerator, options)):
+                if not args.quiet:
+                    write('* Copied', options.filename, 'from output cache',
+                          file=sys.stderr)
+                targets.remove(target)
+        if not targets:
+            return
+
+    loadRegistry(args)
+
+    fingerprints = {}
+    if (args.fingerprint):
+        for target in [target for target in targets if target in genOpts.keys()]:
+            createGenerator, options = genOpts[target]
+            reg.setGenerator(createGenerator(errFile=errWarn,
+                                             warnFile=errWarn,
+                                             diagFile=diag))
+            fingerprint = targetHash(createGenerator, options,
+                                     reg.interfaceHash(options))
+            if (readFingerprint(options) == fingerprint):
+                if not args.quiet:
+                    write('* Skipped', options.filename, '(fingerprint unchanged)',
+                          file=sys.stderr)
+                targets.remove(target)
+            else:
+                fingerprints[target] = fingerprint
+
+    jobs = min(args.jobs or os.cpu_count() or 1, len(targets))
+    context = None
+    if (jobs > 1):
+        import multiprocessing
+        if ('fork' in multiprocessing.get_all_start_methods()):
+            context = multiprocessing.get_context('fork')
+        else:
+            write('Forking is not supported on this platform,',
+                  'generating targets serially', file=sys.stderr)
+
+    if (context):
+        import tempfile
+        # Flush anything buffered before forking so it isn't written twice
+        sys.stdout.flush()
+        sys.stderr.flush()
+        errWarn.flush()
+        if (diag):
+            diag.flush()
+        # Workers writing to the same -errfile / -diagfile would interleave
+        # their lines, so each target logs to its own files, which are
+        # appended to the real ones in target order afterwards
+        with tempfile.TemporaryDirectory() as logDir:
+            try:
+                with context.Pool(jobs) as pool:
+                    pool.starmap(genOneTargetLogged,
+                                 [(args, target, cache, fingerprints.get(target), logDir, index)
+                                  for index, target in enumerate(targets)],
+                                 chunksize=1)
+            finally:
+                for index in range(len(targets)):
+                    if (args.errfile):
+                        appendLog(errWarn, logFileName(logDir, index, 'err'))
+                    if (diag):
+                        appendLog(diag, logFileName(logDir, index, 'diag'))
+    else:
+        for target in targets:
+            genOneTarget(args, target, cache, fingerprints.get(target))
+
+# Generation server - keeps the parsed registry loaded between requests
+# from clients run with -socket, which saves each run the interpreter
+# startup, imports and registry parsing. Requests are handled one at a
+# time. Each is a JSON object holding the client's command line arguments
+# and working directory, and the reply holds the run's exit status and the
+# text it wrote to stdout and stderr. A status of None tells the client to
+# generate the targets itself, for requests the server can't handle.
+# The registry is reloaded when its file's contents change. The generator
+# scripts can't be reloaded, so if one of them changes, the server tells
+# the client to generate the targets itself, and exits.
+
+# Return the modification time and size of a file, to detect changes
+def fileStat(filename):
+    stat = os.stat(filename)
+    return (stat.st_mtime_ns, stat.st_size)
+
+# Read from a socket until the other end shuts down its side
+def receiveAll(conn):
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+# Serve generation requests on the Unix socket args.serve, until interrupted
+def serve(parser, args):
+    import json, signal, socket
+    global reg
+
+    if not hasattr(socket, 'AF_UNIX'):
+        write('Unix sockets are not supported on this platform', file=sys.stderr)
+        sys.exit(1)
+
+    registry = os.path.abspath(args.registry)
+    loadRegistry(args)
+    registryStat = fileStat(registry)
+    # Import every generator now, so that all of them are watched for changes
+    makeGenOpts()
+    for target in genOpts.keys():
+        genOpts[target]
+    scripts = dict([(filename, fileStat(filename)) for filename in scriptModuleFiles()])
+
+    # Replace the socket of a server which is no longer running
+    if os.path.exists(args.serve):
+        os.remove(args.serve)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(args.serve)
+    server.listen(8)
+    write('* Serving', registry, 'on', args.serve, file=sys.stderr)
+    # Remove the socket when terminated, as well as when interrupted
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        while True:
+            conn, address = server.accept()
+            # A bad request, or a client which goes away before the reply,
+            # only ends that connection
+            try:
+                with conn:
+                    request = json.loads(receiveAll(conn).decode('utf-8'))
+                    if any([fileStat(filename) != stat for filename, stat in scripts.items()]):
+                        write('* Generator scripts changed, exiting', file=sys.stderr)
+                        conn.sendall(json.dumps({ 'status' : None }).encode('utf-8'))
+                        break
+                    if (fileStat(registry) != registryStat):
+                        registryStat = fileStat(registry)
+                        # The hashes of source files are kept for the run, so
+                        # forget them before looking at the registry again
+                        oldHash = sourceHash(registry)
+                        sourceHashes.clear()
+                        if (sourceHash(registry) != oldHash):
+                            write('* Reloading', registry, file=sys.stderr)
+                            reg = None
+                            loadRegistry(args)
+                    reply = handleRequest(parser, request, registry)
+                    conn.sendall(json.dumps(reply).encode('utf-8'))
+            except (ValueError, KeyError, OSError) as e:
+                write('* Request failed:', repr(e), file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(args.serve)
+
+# Run a request received by the server, returning the reply
+def handleRequest(parser, request, registry):
+    import contextlib, io, traceback
+    global errWarn, diag
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    status = 0
+    cwd = os.getcwd()
+    errWarn = diag = None
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            os.chdir(request['cwd'])
+            args = parseArgs(parser, request['argv'])
+            if (os.path.abspath(args.registry) != registry or
+                args.debug or args.profile or args.validate or args.dump):
+                return { 'status' : None }
+            # Workers forked from the server couldn't write to the reply,
+            # so targets are generated one after another
+            args.jobs = 1
+            errWarn = open(args.errfile, 'w', encoding='utf-8') if args.errfile else sys.stderr
+            diag = open(args.diagfile, 'w', encoding='utf-8') if args.diagfile else None
+            genTarget(args)
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        finally:
+            if (errWarn and errWarn != sys.stderr):
+                errWarn.close()
+            if (diag):
+                diag.close()
+            os.chdir(cwd)
+    return { 'status' : status,
+             'stdout' : stdout.getvalue(),
+             'stderr' : stderr.getvalue() }
+
+# Send a request with the command line arguments argv to the server on the
+# Unix socket socketPath, and write out its reply. Returns the exit status
+# of the request, or None if the targets must be generated in this process
+# instead - when no server is running, or the server can't handle it.
+def forwardRequest(socketPath, argv):
+    import json, socket
+
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socketPath)
+            client.sendall(json.dumps({ 'argv' : argv,
+                                        'cwd' : os.getcwd() }).encode('utf-8'))
+            client.shutdown(socket.SHUT_WR)
+            reply = json.loads(receiveAll(client).decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+    if (reply['status'] == None):
+        return None
+    sys.stdout.write(reply['stdout'])
+    sys.stderr.write(reply['stderr'])
+    return reply['status']
+
+# Build the command line argument parser.
 # -extension name - may be a single extension name, a a space-separated list
 # of names, or a regular expression.
-if __name__ == '__main__':
+def makeArgParser():
     parser = argparse.ArgumentParser()
 
     parser.add_argument('-extension', action='append',
@@ -347,6 +860,9 @@ if __name__ == '__main__':
     parser.add_argument('-removeExtension', action='append',
                         default=[],
                         help='Specify an extension or extensions to remove from targets')
+    parser.add_argument('-cache', action='store',
+                        default=None,
+                        help='Cache the parsed registry in the specified directory')
     parser.add_argument('-debug', action='store_true',
                         help='Enable debugging')
     parser.add_argument('-dump', action='store_true',
@@ -364,6 +880,8 @@ if __name__ == '__main__':
     parser.add_argument('-registry', action='store',
                         default='vk.xml',
                         help='Use specified registry file instead of vk.xml')
+    parser.add_argument('-stream', action='store_true',
+                        help='Parse the registry with the streaming loader, which uses a little less memory but is slower')
     parser.add_argument('-time', action='store_true',
                         help='Enable timing')
     parser.add_argument('-validate', action='store_true',
@@ -371,31 +889,59 @@ if __name__ == '__main__':
     parser.add_argument('-o', action='store', dest='directory',
                         default='.',
                         help='Create target and related files in specified directory')
-    parser.add_argument('target', metavar='target', nargs='?',
-                        help='Specify target')
+    parser.add_argument('target', metavar='target', nargs='*',
+                        help='Specify target(s), or \'all\' for every target')
+    parser.add_argument('-jobs', action='store', type=int,
+                        default=1,
+                        help='Generate up to this many targets concurrently, or 0 for one per CPU')
     parser.add_argument('-quiet', action='store_true', default=False,
                         help='Suppress script output during normal execution.')
+    parser.add_argument('-outputcache', action='store',
+                        default=None,
+                        help='Cache generated files in the specified directory, and copy unchanged targets from it')
+    parser.add_argument('-outputcachesize', action='store', type=int,
+                        default=64,
+                        help='Evict least recently used files once the output cache exceeds this many MB')
+    parser.add_argument('-depfile', action='store',
+                        default=None,
+                        help='Write a Make/Ninja depfile listing the registry and the generator modules used')
+    parser.add_argument('-fingerprint', action='store_true',
+                        help='Skip targets whose fingerprint, stored next to the generated file, is unchanged')
+    parser.add_argument('-serve', action='store',
+                        default=None,
+                        help='Keep the parsed registry loaded and serve generation requests on the specified Unix socket')
+    parser.add_argument('-socket', action='store',
+                        default=None,
+                        help='Send the request to a server started with -serve on the specified Unix socket, if one is running')
+    return parser
 
-    args = parser.parse_args()
+# Parse command line arguments with a parser from makeArgParser()
+def parseArgs(parser, argv):
+    args = parser.parse_args(argv)
 
     # This splits arguments which are space-separated lists
     args.extension = [name for arg in args.extension for name in arg.split()]
+    return args
 
-    # Load & parse registry
-    reg = Registry()
+if __name__ == '__main__':
+    parser = makeArgParser()
+    args = parseArgs(parser, sys.argv[1:])
 
-    startTimer(args.time)
-    tree = etree.parse(args.registry)
-    endTimer(args.time, '* Time to make ElementTree =')
+    if (args.serve):
+        serve(parser, args)
+        sys.exit(0)
 
-    startTimer(args.time)
-    reg.loadElementTree(tree)
-    endTimer(args.time, '* Time to parse ElementTree =')
+    if (args.socket and not (args.debug or args.profile or args.validate or args.dump)):
+        status = forwardRequest(args.socket, sys.argv[1:])
+        if (status != None):
+            sys.exit(status)
 
     if (args.validate):
+        loadRegistry(args)
         reg.validateGroups()
 
     if (args.dump):
+        loadRegistry(args)
         write('* Dumping registry to regdump.txt', file=sys.stderr)
         reg.dumpReg(filehandle = open('regdump.txt','w', encoding='utf-8'))
 
@@ -411,6 +957,7 @@ if __name__ == '__main__':
         diag = None
 
     if (args.debug):
+        import pdb
         pdb.run('genTarget(args)')
     elif (args.profile):
         import cProfile, pstats
@@ -98,6 +98,78 @@ class ParamCheckerGeneratorOptions(GeneratorOptions):
         self.indentFuncPointer = indentFuncPointer
         self.alignFuncParam  = alignFuncParam
 
+# StructCodeTemplate - struct member validation code, compiled once.
+#
+# The validation code generated for a struct contains {funcName},
+# {valuePrefix}, {displayNamePrefix} and {postProc*} placeholders that are
+# filled in each time the struct is validated as a command parameter or as a
+# member of another struct.  The placeholder scan and the escaping of the C++
+# IndexVector braces are done once here, and expansions are memoized by
+# their substitution arguments.
+#
+# ---- methods ----
+# StructCodeTemplate(lines) - lines as returned by genFuncBody; an entry may
+#   be a list of lines forming a single group.
+# expand(funcName, memberNamePrefix, memberDisplayNamePrefix, indent,
+#   postProcSpec) - returns a list of line groups with placeholders replaced.
+class StructCodeTemplate:
+    """Precompiled struct member validation code"""
+    PLACEHOLDERS = ('postProcPrefix', 'postProcSuffix', 'postProcInsert', 'funcName', 'valuePrefix', 'displayNamePrefix')
+    def __init__(self, lines):
+        self.fields = set()       # Placeholders used by any line of the template
+        self.groups = []          # Per line group, a list of (text, needsFormat) tuples
+        self.expansions = {}      # Memoized expansions, keyed by substitution arguments
+        for line in lines:
+            subs = line if type(line) is list else [line]
+            self.groups.append([self.compileLine(sub) for sub in subs])
+    #
+    # Record the placeholders used by a line, escaping its C++ curly braces if it will be formatted
+    def compileLine(self, line):
+        fields = [name for name in self.PLACEHOLDERS if '{' + name + '}' in line]
+        if not fields:
+            return (line, False)
+        self.fields.update(fields)
+        if 'IndexVector' in line:
+            line = line.replace('IndexVector{ ', 'IndexVector{{ ')
+            line = line.replace(' }),', ' }}),')
+        return (line, True)
+    #
+    # Build the format arguments for the placeholders used by the template
+    def substitutions(self, funcName, memberNamePrefix, memberDisplayNamePrefix, postProcSpec):
+        kwargs = {}
+        # If we have a tuple that includes a format string and format parameters, need to use ParameterName class
+        isTuple = type(memberDisplayNamePrefix) is tuple
+        if 'postProcPrefix' in self.fields:
+            kwargs['postProcPrefix'] = 'ParameterName(' if isTuple else postProcSpec['ppp']
+        if 'postProcSuffix' in self.fields:
+            if isTuple:
+                kwargs['postProcSuffix'] = ', ParameterName::IndexVector{{ {}{} }})'.format(postProcSpec['ppi'], memberDisplayNamePrefix[1])
+            else:
+                kwargs['postProcSuffix'] = postProcSpec['pps']
+        if 'postProcInsert' in self.fields:
+            if isTuple:
+                kwargs['postProcInsert'] = '{}{}, '.format(postProcSpec['ppi'], memberDisplayNamePrefix[1])
+            else:
+                kwargs['postProcInsert'] = postProcSpec['ppi']
+        if 'funcName' in self.fields:
+            kwargs['funcName'] = funcName
+        if 'valuePrefix' in self.fields:
+            kwargs['valuePrefix'] = memberNamePrefix
+        if 'displayNamePrefix' in self.fields:
+            kwargs['displayNamePrefix'] = memberDisplayNamePrefix[0] if isTuple else memberDisplayNamePrefix
+        return kwargs
+    #
+    # Return the template's line groups with all placeholders replaced
+    def expand(self, funcName, memberNamePrefix, memberDisplayNamePrefix, indent, postProcSpec):
+        key = (funcName, memberNamePrefix, memberDisplayNamePrefix, indent, postProcSpec['ppp'], postProcSpec['pps'], postProcSpec['ppi'])
+        groups = self.expansions.get(key)
+        if groups is None:
+            kwargs = self.substitutions(funcName, memberNamePrefix, memberDisplayNamePrefix, postProcSpec)
+            groups = [[indent + (text.format(**kwargs) if needsFormat else text) for text, needsFormat in group]
+                      for group in self.groups]
+            self.expansions[key] = groups
+        return groups
+
 # ParamCheckerOutputGenerator - subclass of OutputGenerator.
 # Generates param checker layer code.
 #
@@ -148,7 +220,7 @@ class ParamCheckerOutputGenerator(OutputGenerator):
         self.handleTypes = set()                          # Set of handle type names
         self.commands = []                                # List of CommandData records for all Vulkan commands
         self.structMembers = []                           # List of StructMemberData records for all Vulkan structs
-        self.validatedStructs = dict()                    # Map of structs type names to generated validation code for that struct type
+        self.validatedStructs = dict()                    # Map of structs type names to compiled validation code for that struct type
         self.enumRanges = dict()                          # Map of enum name to BEGIN/END range values
         self.flags = set()                                # Map of flags typenames
         self.flagBits = dict()                            # Map of flag bits typename to list of values
@@ -293,7 +365,7 @@ class ParamCheckerOutputGenerator(OutputGenerator):
         typeElem = typeinfo.elem
         # If the type is a struct type, traverse the imbedded <member> tags
         # generating a structure. Otherwise, emit the tag text.
-        category = typeElem.get('category')
+        category = typeinfo.category
         if (category == 'struct' or category == 'union'):
             self.structNames.append(name)
             self.genStruct(typeinfo, name)
@@ -317,63 +389,50 @@ class ParamCheckerOutputGenerator(OutputGenerator):
     def genStruct(self, typeinfo, typeName):
         OutputGenerator.genStruct(self, typeinfo, typeName)
         conditions = self.structMemberValidationConditions[typeName] if typeName in self.structMemberValidationConditions else None
-        members = typeinfo.elem.findall('.//member')
+        layout = typeinfo.layout
         #
-        # Iterate over members once to get length parameters for arrays
-        lens = set()
-        for member in members:
-            len = self.getLen(member)
-            if len:
-                lens.add(len)
+        # Process VkStructureType
+        if layout.stypeMember is not None:
+            # The required struct type value, from the sType member's
+            # 'values' attribute
+            value = layout.stype
+            if value is None:
+                value = self.genVkStructureType(typeName)
+            # Store the required type value
+            self.structTypes[typeName] = self.StructType(name=layout.stypeMember, value=value)
         #
         # Generate member info
         membersInfo = []
-        for member in members:
-            # Get the member's type and name
-            info = self.getTypeNameTuple(member)
-            type = info[0]
-            name = info[1]
-            stypeValue = ''
-            cdecl = self.makeCParamDecl(member, 0)
-            # Process VkStructureType
-            if type == 'VkStructureType':
-                # Extract the required struct type value from the comments
-                # embedded in the original text defining the 'typeinfo' element
-                rawXml = etree.tostring(typeinfo.elem).decode('ascii')
-                result = re.search(r'VK_STRUCTURE_TYPE_\w+', rawXml)
-                if result:
-                    value = result.group(0)
-                else:
-                    value = self.genVkStructureType(typeName)
-                # Store the required type value
-                self.structTypes[typeName] = self.StructType(name=name, value=value)
+        for member in layout.members:
+            type = member.type
+            name = member.name
             #
             # Store pointer/array/string info
             # Check for parameter name in lens set
             iscount = False
-            if name in lens:
+            if name in layout.lens:
                 iscount = True
             # The pNext members are not tagged as optional, but are treated as
             # optional for parameter NULL checks.  Static array members
             # are also treated as optional to skip NULL pointer validation, as
             # they won't be NULL.
-            isstaticarray = self.paramIsStaticArray(member)
+            isstaticarray = member.staticArray
             isoptional = False
-            if self.paramIsOptional(member) or (name == 'pNext') or (isstaticarray):
+            if member.optional or (name == 'pNext') or (isstaticarray):
                 isoptional = True
             membersInfo.append(self.CommandParam(type=type, name=name,
-                                                ispointer=self.paramIsPointer(member),
+                                                ispointer=member.pointerDepth,
                                                 isstaticarray=isstaticarray,
                                                 isbool=True if type == 'VkBool32' else False,
                                                 israngedenum=True if type in self.enumRanges else False,
-                                                isconst=True if 'const' in cdecl else False,
+                                                isconst=member.isconst,
                                                 isoptional=isoptional,
                                                 iscount=iscount,
-                                                noautovalidity=True if member.attrib.get('noautovalidity') is not None else False,
-                                                len=self.getLen(member),
-                                                extstructs=member.attrib.get('validextensionstructs') if name == 'pNext' else None,
+                                                noautovalidity=member.noautovalidity,
+                                                len=member.len,
+                                                extstructs=member.extstructs if name == 'pNext' else None,
                                                 condition=conditions[name] if conditions and name in conditions else None,
-                                                cdecl=cdecl))
+                                                cdecl=member.cdecl))
         self.structMembers.append(self.StructMemberData(name=typeName, members=membersInfo))
     #
     # Capture group (e.g. C "enum" type) info to be used for
@@ -381,16 +440,15 @@ class ParamCheckerOutputGenerator(OutputGenerator):
     # These are concatenated together with other types.
     def genGroup(self, groupinfo, groupName):
         OutputGenerator.genGroup(self, groupinfo, groupName)
-        groupElem = groupinfo.elem
         #
         # Store the sType values
         if groupName == 'VkStructureType':
-            for elem in groupElem.findall('enum'):
-                self.stypes.append(elem.get('name'))
+            for enuminfo in groupinfo.enums:
+                self.stypes.append(enuminfo.name)
         elif 'FlagBits' in groupName:
             bits = []
-            for elem in groupElem.findall('enum'):
-                bits.append(elem.get('name'))
+            for enuminfo in groupinfo.enums:
+                bits.append(enuminfo.name)
             if bits:
                 self.flagBits[groupName] = bits
         else:
@@ -430,79 +488,25 @@ class ParamCheckerOutputGenerator(OutputGenerator):
                 self.intercepts += [ '#endif' ]
                 self.declarations += [ '#endif' ]
         if name not in self.blacklist:
-            params = cmdinfo.elem.findall('param')
-            # Get list of array lengths
-            lens = set()
-            for param in params:
-                len = self.getLen(param)
-                if len:
-                    lens.add(len)
+            signature = cmdinfo.signature
             # Get param info
             paramsInfo = []
-            for param in params:
-                paramInfo = self.getTypeNameTuple(param)
-                cdecl = self.makeCParamDecl(param, 0)
-                # Check for parameter name in lens set
-                iscount = False
-                if paramInfo[1] in lens:
-                    iscount = True
-                paramsInfo.append(self.CommandParam(type=paramInfo[0], name=paramInfo[1],
-                                                    ispointer=self.paramIsPointer(param),
-                                                    isstaticarray=self.paramIsStaticArray(param),
-                                                    isbool=True if paramInfo[0] == 'VkBool32' else False,
-                                                    israngedenum=True if paramInfo[0] in self.enumRanges else False,
-                                                    isconst=True if 'const' in cdecl else False,
-                                                    isoptional=self.paramIsOptional(param),
-                                                    iscount=iscount,
-                                                    noautovalidity=True if param.attrib.get('noautovalidity') is not None else False,
-                                                    len=self.getLen(param),
+            for param in signature.params:
+                paramsInfo.append(self.CommandParam(type=param.type, name=param.name,
+                                                    ispointer=param.pointerDepth,
+                                                    isstaticarray=param.staticArray,
+                                                    isbool=True if param.type == 'VkBool32' else False,
+                                                    israngedenum=True if param.type in self.enumRanges else False,
+                                                    isconst=param.isconst,
+                                                    isoptional=param.optional,
+                                                    iscount=param.name in signature.lens,
+                                                    noautovalidity=param.noautovalidity,
+                                                    len=param.len,
                                                     extstructs=None,
                                                     condition=None,
-                                                    cdecl=cdecl))
+                                                    cdecl=param.cdecl))
             self.commands.append(self.CommandData(name=name, params=paramsInfo, cdecl=self.makeCDecls(cmdinfo.elem)[0]))
     #
-    # Check if the parameter passed in is a pointer
-    def paramIsPointer(self, param):
-        ispointer = 0
-        paramtype = param.find('type')
-        if (paramtype.tail is not None) and ('*' in paramtype.tail):
-            ispointer = paramtype.tail.count('*')
-        elif paramtype.text[:4] == 'PFN_':
-            # Treat function pointer typedefs as a pointer to a single value
-            ispointer = 1
-        return ispointer
-    #
-    # Check if the parameter passed in is a static array
-    def paramIsStaticArray(self, param):
-        isstaticarray = 0
-        paramname = param.find('name')
-        if (paramname.tail is not None) and ('[' in paramname.tail):
-            isstaticarray = paramname.tail.count('[')
-        return isstaticarray
-    #
-    # Check if the parameter passed in is optional
-    # Returns a list of Boolean values for comma separated len attributes (len='false,true')
-    def paramIsOptional(self, param):
-        # See if the handle is optional
-        isoptional = False
-        # Simple, if it's optional, return true
-        optString = param.attrib.get('optional')
-        if optString:
-            if optString == 'true':
-                isoptional = True
-            elif ',' in optString:
-                opts = []
-                for opt in optString.split(','):
-                    val = opt.strip()
-                    if val == 'true':
-                        opts.append(True)
-                    elif val == 'false':
-                        opts.append(False)
-                    else:
-                        print('Unrecognized len attribute value',val)
-                isoptional = opts
-        return isoptional
-    #
     # Check if the handle passed in is optional
     # Uses the same logic as ValidityOutputGenerator.isHandleOptional
     def isHandleOptional(self, param, lenParam):
@@ -536,36 +540,9 @@ class ParamCheckerOutputGenerator(OutputGenerator):
             value = self.structTypes[typename].value
         else:
             value = self.genVkStructureType(typename)
-            self.logMsg('diag', 'ParameterValidation: Generating {} for {} structure type that was not defined by the current feature'.format(value, typename))
+            self.diag('ParameterValidation: Generating', value, 'for', typename, 'structure type that was not defined by the current feature')
         return value
     #
-    # Retrieve the value of the len tag
-    def getLen(self, param):
-        result = None
-        len = param.attrib.get('len')
-        if len and len != 'null-terminated':
-            # For string arrays, 'len' can look like 'count,null-terminated',
-            # indicating that we have a null terminated array of strings.  We
-            # strip the null-terminated from the 'len' field and only return
-            # the parameter specifying the string count
-            if 'null-terminated' in len:
-                result = len.split(',')[0]
-            else:
-                result = len
-            result = str(result).replace('::', '->')
-        return result
-    #
-    # Retrieve the type and name for a parameter
-    def getTypeNameTuple(self, param):
-        type = ''
-        name = ''
-        for elem in param:
-            if elem.tag == 'type':
-                type = noneStr(elem.text)
-            elif elem.tag == 'name':
-                name = noneStr(elem.text)
-        return (type, name)
-    #
     # Find a named parameter in a parameter list
     def getParamByName(self, params, name):
         for param in params:
@@ -764,57 +741,12 @@ class ParamCheckerOutputGenerator(OutputGenerator):
                 checkExpr.append('skipCall |= validate_required_pointer(report_data, "{}", {ppp}"{}"{pps}, {}{});\n'.format(funcPrintName, valuePrintName, prefix, value.name, **postProcSpec))
         return checkExpr
     #
-    # Process struct member validation code, performing name suibstitution if required
-    def processStructMemberCode(self, line, funcName, memberNamePrefix, memberDisplayNamePrefix, postProcSpec):
-        # Build format specifier list
-        kwargs = {}
-        if '{postProcPrefix}' in line:
-            # If we have a tuple that includes a format string and format parameters, need to use ParameterName class
-            if type(memberDisplayNamePrefix) is tuple:
-                kwargs['postProcPrefix'] = 'ParameterName('
-            else:
-                kwargs['postProcPrefix'] = postProcSpec['ppp']
-        if '{postProcSuffix}' in line:
-            # If we have a tuple that includes a format string and format parameters, need to use ParameterName class
-            if type(memberDisplayNamePrefix) is tuple:
-                kwargs['postProcSuffix'] = ', ParameterName::IndexVector{{ {}{} }})'.format(postProcSpec['ppi'], memberDisplayNamePrefix[1])
-            else:
-                kwargs['postProcSuffix'] = postProcSpec['pps']
-        if '{postProcInsert}' in line:
-            # If we have a tuple that includes a format string and format parameters, need to use ParameterName class
-            if type(memberDisplayNamePrefix) is tuple:
-                kwargs['postProcInsert'] = '{}{}, '.format(postProcSpec['ppi'], memberDisplayNamePrefix[1])
-            else:
-                kwargs['postProcInsert'] = postProcSpec['ppi']
-        if '{funcName}' in line:
-            kwargs['funcName'] = funcName
-        if '{valuePrefix}' in line:
-            kwargs['valuePrefix'] = memberNamePrefix
-        if '{displayNamePrefix}' in line:
-            # Check for a tuple that includes a format string and format parameters to be used with the ParameterName class
-            if type(memberDisplayNamePrefix) is tuple:
-                kwargs['displayNamePrefix'] = memberDisplayNamePrefix[0]
-            else:
-                kwargs['displayNamePrefix'] = memberDisplayNamePrefix
-
-        if kwargs:
-            # Need to escape the C++ curly braces
-            if 'IndexVector' in line:
-                line = line.replace('IndexVector{ ', 'IndexVector{{ ')
-                line = line.replace(' }),', ' }}),')
-            return line.format(**kwargs)
-        return line
-    #
     # Process struct validation code for inclusion in function or parent struct validation code
-    def expandStructCode(self, lines, funcName, memberNamePrefix, memberDisplayNamePrefix, indent, output, postProcSpec):
-        for line in lines:
+    def expandStructCode(self, template, funcName, memberNamePrefix, memberDisplayNamePrefix, indent, output, postProcSpec):
+        for group in template.expand(funcName, memberNamePrefix, memberDisplayNamePrefix, indent, postProcSpec):
             if output:
                 output[-1] += '\n'
-            if type(line) is list:
-                for sub in line:
-                    output.append(self.processStructMemberCode(indent + sub, funcName, memberNamePrefix, memberDisplayNamePrefix, postProcSpec))
-            else:
-                output.append(self.processStructMemberCode(indent + line, funcName, memberNamePrefix, memberDisplayNamePrefix, postProcSpec))
+            output.extend(group)
         return output
     #
     # Process struct pointer/array validation code, perfoeming name substitution if required
@@ -908,7 +840,7 @@ class ParamCheckerOutputGenerator(OutputGenerator):
                 # members not tagged as 'noatuvalidity' will be validated
                 if value.noautovalidity:
                     # Log a diagnostic message when validation cannot be automatically generated and must be implemented manually
-                    self.logMsg('diag', 'ParameterValidation: No validation for {} {}'.format(structTypeName if structTypeName else funcName, value.name))
+                    self.diag('ParameterValidation: No validation for', structTypeName if structTypeName else funcName, value.name)
                 else:
                     #
                     # If this is a pointer to a struct with an sType field, verify the type
@@ -942,7 +874,7 @@ class ParamCheckerOutputGenerator(OutputGenerator):
                 # members not tagged as 'noatuvalidity' will be validated
                 if value.noautovalidity:
                     # Log a diagnostic message when validation cannot be automatically generated and must be implemented manually
-                    self.logMsg('diag', 'ParameterValidation: No validation for {} {}'.format(structTypeName if structTypeName else funcName, value.name))
+                    self.diag('ParameterValidation: No validation for', structTypeName if structTypeName else funcName, value.name)
                 else:
                     if value.type in self.structTypes:
                         stype = self.structTypes[value.type]
@@ -993,7 +925,7 @@ class ParamCheckerOutputGenerator(OutputGenerator):
             # The string returned by genFuncBody will be nested in an if check for a NULL pointer, so needs its indent incremented
             lines, unused = self.genFuncBody('{funcName}', struct.members, '{valuePrefix}', '{displayNamePrefix}', struct.name)
             if lines:
-                self.validatedStructs[struct.name] = lines
+                self.validatedStructs[struct.name] = StructCodeTemplate(lines)
     #
     # Generate the command param check code from the captured data
     def processCmdData(self):
@@ -1003,25 +935,28 @@ class ParamCheckerOutputGenerator(OutputGenerator):
             startIndex = 0 if command.name == 'vkCreateInstance' else 1
             lines, unused = self.genFuncBody(command.name, command.params[startIndex:], '', '', None)
             if lines:
-                cmdDef = self.getCmdDef(command) + '\n'
-                cmdDef += '{\n'
+                cmdDef = Emitter(indent)
+                cmdDef.line(self.getCmdDef(command))
+                cmdDef.line('{')
+                cmdDef.indent()
                 # Process unused parameters, Ignoring the first dispatch handle parameter, which is not
                 # processed by parameter_validation (except for vkCreateInstance, which does not have a
                 # handle as its first parameter)
                 if unused:
                     for name in unused:
-                        cmdDef += indent + 'UNUSED_PARAMETER({});\n'.format(name)
+                        cmdDef.line('UNUSED_PARAMETER({});'.format(name))
                     if len(unused) > 0:
-                        cmdDef += '\n'
-                cmdDef += indent + 'bool skipCall = false;\n'
+                        cmdDef.write('\n')
+                cmdDef.line('bool skipCall = false;')
                 for line in lines:
-                    cmdDef += '\n'
+                    cmdDef.write('\n')
                     if type(line) is list:
                         for sub in line:
-                            cmdDef += indent + sub
+                            cmdDef.indented(sub)
                     else:
-                        cmdDef += indent + line
-                cmdDef += '\n'
-                cmdDef += indent + 'return skipCall;\n'
-                cmdDef += '}\n'
-                self.appendSection('command', cmdDef)
+                        cmdDef.indented(line)
+                cmdDef.write('\n')
+                cmdDef.line('return skipCall;')
+                cmdDef.dedent()
+                cmdDef.line('}')
+                self.appendSection('command', cmdDef.getvalue())
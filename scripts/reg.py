@@ -14,7 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import io,os,re,string,sys,copy
+import io,os,re,string,sys,copy,hashlib
 import xml.etree.ElementTree as etree
 
 # matchAPIProfile - returns whether an API and profile
@@ -71,60 +71,298 @@ def matchAPIProfile(api, profile, elem):
 #     (has it been removed by a profile or version)?
 #   declared - has this feature been defined already?
 #   elem - etree Element for this feature
+#   name - 'name' attribute of the element
+#   api - 'api' attribute of the element, or None
 #   resetState() - reset required/declared to initial values. Used
 #     prior to generating a new API interface.
+#   saveState() / restoreState(state) - return / restore a copy of the
+#     generation state, as a tuple
+# Generation state should only be changed through the Registry's
+# GenerationContext, which tracks what needs resetting.
+# The *Info classes use __slots__, since there's one per registry element,
+# and attributes generators need are extracted from the element once here.
 class BaseInfo:
     """Represents the state of a registry feature, used during API generation"""
+    __slots__ = ('required', 'declared', 'elem', 'name', 'api')
     def __init__(self, elem):
         self.required = False
         self.declared = False
         self.elem = elem
+        self.name = elem.get('name')
+        self.api = elem.get('api')
     def resetState(self):
         self.required = False
         self.declared = False
+    def saveState(self):
+        return (self.required, self.declared)
+    def restoreState(self, state):
+        (self.required, self.declared) = state
 
-# TypeInfo - registry information about a type. No additional state
-#   beyond BaseInfo is required.
+# TypeInfo - registry information about a type. The type's dependencies
+# are extracted once, so marking and generating them needn't search the
+# element again:
+#   category - 'category' attribute, e.g. 'struct', or None
+#   requires - name of the type in the 'requires' attribute, or None
+#   subtypes - names of types in nested <type> tags
+#   subenums - names of enums in nested <enum> tags (e.g. array sizes)
+#   layout - StructLayout of a struct or union type, otherwise None
+# name is taken from the nested <name> tag if there's no 'name' attribute.
 class TypeInfo(BaseInfo):
     """Represents the state of a registry type"""
+    __slots__ = ('category', 'requires', 'subtypes', 'subenums', 'layout',
+                 'additionalValidity', 'removedValidity')
     def __init__(self, elem):
         BaseInfo.__init__(self, elem)
+        if (self.name == None):
+            self.name = elem.find('name').text
+        self.category = elem.get('category')
+        if (self.category == 'struct' or self.category == 'union'):
+            self.layout = StructLayout(elem)
+        else:
+            self.layout = None
+        self.requires = elem.get('requires')
+        self.subtypes = [subtype.text for subtype in elem.findall('.//type')]
+        self.subenums = [subenum.text for subenum in elem.findall('.//enum')]
         self.additionalValidity = []
         self.removedValidity = []
     def resetState(self):
         BaseInfo.resetState(self)
-        self.additionalValidity = []
-        self.removedValidity = []
+        if (self.additionalValidity):
+            self.additionalValidity = []
+        if (self.removedValidity):
+            self.removedValidity = []
+    def saveState(self):
+        return (self.required, self.declared,
+                list(self.additionalValidity), list(self.removedValidity))
+    def restoreState(self, state):
+        (self.required, self.declared) = state[0:2]
+        self.additionalValidity = list(state[2])
+        self.removedValidity = list(state[3])
 
 # GroupInfo - registry information about a group of related enums
 # in an <enums> block, generally corresponding to a C "enum" type.
+#   enums - list of EnumInfo for the <enum> tags in the group, followed by
+#     those added to it by <extension> tags, in registry order. Generators
+#     should use this rather than the <enum> children of the element.
 class GroupInfo(BaseInfo):
     """Represents the state of a registry <enums> group"""
+    __slots__ = ('enums',)
     def __init__(self, elem):
         BaseInfo.__init__(self, elem)
+        self.enums = []
 
 # EnumInfo - registry information about an enum
 #   type - numeric type of the value of the <enum> tag
 #     ( '' for GLint, 'u' for GLuint, 'ull' for GLuint64 )
+#   value, bitpos, offset - value of the enum, as given by one of these
+#     attributes (the others are None)
+#   extends - name of the enum group an extension enum is added to
+#   extnumber, extname, supported - number, name and 'supported'
+#     attribute of the extension defining an extension enum, or None.
+#     These are set by Registry.parseTree(), not read from the element.
 class EnumInfo(BaseInfo):
     """Represents the state of a registry enum"""
+    __slots__ = ('type', 'value', 'bitpos', 'offset', 'extends',
+                 'extnumber', 'extname', 'supported')
     def __init__(self, elem):
         BaseInfo.__init__(self, elem)
         self.type = elem.get('type')
         if (self.type == None):
             self.type = ''
+        self.value = elem.get('value')
+        self.bitpos = elem.get('bitpos')
+        self.offset = elem.get('offset')
+        self.extends = elem.get('extends')
+        self.extnumber = None
+        self.extname = None
+        self.supported = None
+
+# HandleInfo - registry information about a handle type. Unlike the
+# other *Info classes this carries no generation state; it's an index
+# so generators don't have to search the tree for handle types.
+#   elem - etree Element for the <type category="handle"> tag
+#   define - macro the handle is defined with, 'VK_DEFINE_HANDLE' or
+#     'VK_DEFINE_NON_DISPATCHABLE_HANDLE'
+#   dispatchable - True if the handle is dispatchable
+#   parent - name of the parent handle type(s), or None
+class HandleInfo:
+    """Represents a registry handle type"""
+    __slots__ = ('elem', 'define', 'dispatchable', 'parent')
+    def __init__(self, elem):
+        self.elem = elem
+        self.define = elem.find('type').text
+        self.dispatchable = (self.define == 'VK_DEFINE_HANDLE')
+        self.parent = elem.get('parent')
+
+# ParamInfo - registry information about a command <param> (or struct
+# <member>) tag, extracted once so generators needn't each walk its
+# children again:
+#   elem - etree Element for the tag
+#   type, name - text of the <type> and <name> tags ('' if missing)
+#   pointerDepth - number of '*' after the <type> tag. Function pointer
+#     (PFN_) types count as a single level.
+#   tailPointer - True if a '*' follows any child tag. Unlike
+#     pointerDepth, PFN_ types don't count.
+#   isconst - True if 'const' appears in the declaration
+#   staticArray - number of array dimensions ('[') after the <name> tag
+#   rawLen - 'len' attribute, or None
+#   len - rawLen with any 'null-terminated' qualifier dropped and '::'
+#     written as '->', or None if there's no len or it's only
+#     'null-terminated'
+#   optional - 'optional' attribute: True or False, or a list of them
+#     for a comma-separated attribute ('false,true')
+#   noautovalidity - True if the 'noautovalidity' attribute is present
+#   externsync - 'externsync' attribute, or None
+#   extstructs - 'validextensionstructs' attribute, or None
+#   cdecl - C declaration of the parameter, unaligned
+#   alignedCDecl(aligncol) - C declaration of the parameter with its name
+#     aligned at column aligncol, as made by makeCParamDecl(). Memoized.
+class ParamInfo:
+    """Represents a registry command parameter or struct member"""
+    __slots__ = ('elem', 'type', 'name', 'pointerDepth', 'tailPointer',
+                 'isconst', 'staticArray', 'rawLen', 'len', 'optional',
+                 'noautovalidity', 'externsync', 'extstructs', 'cdecl',
+                 'cdecls')
+    def __init__(self, elem):
+        self.elem = elem
+        self.type = ''
+        self.name = ''
+        self.tailPointer = False
+        self.cdecl = '    ' + noneStr(elem.text)
+        for child in elem:
+            if (child.tag == 'type'):
+                self.type = noneStr(child.text)
+            elif (child.tag == 'name'):
+                self.name = noneStr(child.text)
+            if (child.tail != None and '*' in child.tail):
+                self.tailPointer = True
+            self.cdecl += noneStr(child.text) + noneStr(child.tail)
+        self.isconst = ('const' in self.cdecl)
+        self.pointerDepth = 0
+        typeElem = elem.find('type')
+        if (typeElem != None):
+            if (typeElem.tail != None and '*' in typeElem.tail):
+                self.pointerDepth = typeElem.tail.count('*')
+            elif (typeElem.text[:4] == 'PFN_'):
+                self.pointerDepth = 1
+        self.staticArray = 0
+        nameElem = elem.find('name')
+        if (nameElem != None and nameElem.tail != None and '[' in nameElem.tail):
+            self.staticArray = nameElem.tail.count('[')
+        self.rawLen = elem.get('len')
+        self.len = None
+        if (self.rawLen and self.rawLen != 'null-terminated'):
+            # For string arrays, 'len' can look like
+            # 'count,null-terminated', indicating that we have a null
+            # terminated array of strings. Only the string count is kept.
+            if ('null-terminated' in self.rawLen):
+                self.len = self.rawLen.split(',')[0]
+            else:
+                self.len = self.rawLen
+            self.len = self.len.replace('::', '->')
+        self.optional = self.parseOptional(elem.get('optional'))
+        self.noautovalidity = (elem.get('noautovalidity') != None)
+        self.externsync = elem.get('externsync')
+        self.extstructs = elem.get('validextensionstructs')
+        self.cdecls = {}
+    def alignedCDecl(self, aligncol):
+        if (aligncol <= 0):
+            return self.cdecl
+        cdecl = self.cdecls.get(aligncol)
+        if (cdecl == None):
+            cdecl = '    ' + noneStr(self.elem.text)
+            for child in self.elem:
+                if (child.tag == 'name'):
+                    # Align at specified column, if possible
+                    cdecl = cdecl.rstrip().ljust(aligncol-1) + ' '
+                cdecl += noneStr(child.text) + noneStr(child.tail)
+            self.cdecls[aligncol] = cdecl
+        return cdecl
+    def parseOptional(self, optString):
+        isoptional = False
+        if optString:
+            if optString == 'true':
+                isoptional = True
+            elif ',' in optString:
+                opts = []
+                for opt in optString.split(','):
+                    val = opt.strip()
+                    if val == 'true':
+                        opts.append(True)
+                    elif val == 'false':
+                        opts.append(False)
+                    else:
+                        print('Unrecognized len attribute value',val)
+                isoptional = opts
+        return isoptional
+
+# CommandSignature - the prototype of a command, extracted once from its
+# <command> tag and shared by all generators
+#   returnType - text of the <proto><type> tag, or None
+#   params - list of ParamInfo for the <param> tags, in order
+#   lens - set of the len expressions of the parameters, used to
+#     identify count parameters
+class CommandSignature:
+    """Represents the prototype of a registry command"""
+    __slots__ = ('returnType', 'params', 'lens')
+    def __init__(self, elem):
+        returnType = elem.find('proto/type')
+        self.returnType = returnType.text if returnType != None else None
+        self.params = [ParamInfo(param) for param in elem.findall('param')]
+        self.lens = set(param.len for param in self.params if param.len)
+
+# StructLayout - the members of a struct or union type, extracted once
+# from its <type> tag and shared by all generators
+#   members - list of ParamInfo for the <member> tags, in order
+#   lens - set of the len expressions of the members, used to identify
+#     count members
+#   stypeMember - name of the (last) VkStructureType member, or None
+#   stype - VK_STRUCTURE_TYPE_* value of the struct, from the 'values'
+#     attribute of that member, or None
+class StructLayout:
+    """Represents the members of a registry struct type"""
+    __slots__ = ('elem', 'members', 'lens', 'stypeMember', 'stype')
+    def __init__(self, elem):
+        self.elem = elem
+        self.members = [ParamInfo(member) for member in elem.findall('.//member')]
+        self.lens = set(member.len for member in self.members if member.len)
+        self.stypeMember = None
+        self.stype = None
+        for member in self.members:
+            if (member.type == 'VkStructureType'):
+                self.stypeMember = member.name
+                self.stype = member.elem.get('values')
 
 # CmdInfo - registry information about a command
+#   signature - CommandSignature of the command
+#   name is taken from the <proto><name> tag if there's no 'name' attribute.
+#   subtypes - names of types in nested <type> tags (return and
+#     parameter types), extracted once like those of TypeInfo
 class CmdInfo(BaseInfo):
     """Represents the state of a registry command"""
+    __slots__ = ('signature', 'subtypes', 'additionalValidity',
+                 'removedValidity')
     def __init__(self, elem):
         BaseInfo.__init__(self, elem)
+        if (self.name == None):
+            self.name = elem.find('proto/name').text
+        self.signature = CommandSignature(elem)
+        self.subtypes = [subtype.text for subtype in elem.findall('.//type')]
         self.additionalValidity = []
         self.removedValidity = []
     def resetState(self):
         BaseInfo.resetState(self)
-        self.additionalValidity = []
-        self.removedValidity = []
+        if (self.additionalValidity):
+            self.additionalValidity = []
+        if (self.removedValidity):
+            self.removedValidity = []
+    def saveState(self):
+        return (self.required, self.declared,
+                list(self.additionalValidity), list(self.removedValidity))
+    def restoreState(self, state):
+        (self.required, self.declared) = state[0:2]
+        self.additionalValidity = list(state[2])
+        self.removedValidity = list(state[3])
 
 # FeatureInfo - registry information about an API <feature>
 # or <extension>
@@ -137,12 +375,15 @@ class CmdInfo(BaseInfo):
 #     assigning enumerant offsets. <feature> features do
 #     not have extension numbers and are assigned number 0.
 #   category - category, e.g. VERSION or khr/vendor tag
+#   supported - 'supported' attribute of an <extension>, or None
+#   protect - 'protect' attribute (a preprocessor symbol), or None
 #   emit - has this feature been defined already?
 class FeatureInfo(BaseInfo):
     """Represents the state of an API feature (version/extension)"""
+    __slots__ = ('category', 'version', 'number', 'supported', 'protect',
+                 'emit')
     def __init__(self, elem):
         BaseInfo.__init__(self, elem)
-        self.name = elem.get('name')
         # Determine element category (vendor). Only works
         # for <extension> elements.
         if (elem.tag == 'feature'):
@@ -155,9 +396,64 @@ class FeatureInfo(BaseInfo):
             self.version = "0"
             self.number = elem.get('number')
             self.supported = elem.get('supported')
+        self.protect = elem.get('protect')
+        self.emit = False
+    def resetState(self):
+        BaseInfo.resetState(self)
         self.emit = False
+    def saveState(self):
+        return (self.required, self.declared, self.emit)
+    def restoreState(self, state):
+        (self.required, self.declared, self.emit) = state
+
+# GenerationContext - the per-generation state of a Registry's *Info
+# objects. Every change of state goes through the context, which keeps the
+# set of objects it has touched, so resetting between generations only
+# visits those, rather than every object in the registry.
+#   touched - set of *Info objects whose state may differ from the
+#     initial state
+#   require(info, required) - set info.required
+#   declare(info) - set info.declared
+#   emit(info, emit) - set info.emit of a FeatureInfo
+#   addValidity(info, usage) / removeValidity(info, usage) - append a
+#     <usage> Element to info.additionalValidity / info.removedValidity
+#   reset() - reset the state of every touched object
+#   snapshot() - return a copy of the state of every touched object
+#   restore(snapshot) - reset, then restore the state from a snapshot.
+#     A snapshot can be restored any number of times.
+class GenerationContext:
+    """Tracks the generation state of registry features"""
+    __slots__ = ('touched',)
+    def __init__(self):
+        self.touched = set()
+    def require(self, info, required):
+        self.touched.add(info)
+        info.required = required
+    def declare(self, info):
+        self.touched.add(info)
+        info.declared = True
+    def emit(self, info, emit):
+        self.touched.add(info)
+        info.emit = emit
+    def addValidity(self, info, usage):
+        self.touched.add(info)
+        info.additionalValidity.append(usage)
+    def removeValidity(self, info, usage):
+        self.touched.add(info)
+        info.removedValidity.append(usage)
+    def reset(self):
+        for info in self.touched:
+            info.resetState()
+        self.touched.clear()
+    def snapshot(self):
+        return dict([(info, info.saveState()) for info in self.touched])
+    def restore(self, snapshot):
+        self.reset()
+        for info, state in snapshot.items():
+            info.restoreState(state)
+        self.touched.update(snapshot)
 
-from generator import write, GeneratorOptions, OutputGenerator
+from generator import write, noneStr, GeneratorOptions, OutputGenerator
 
 # Registry - object representing an API registry, loaded from an XML file
 # Members
@@ -169,6 +465,52 @@ from generator import write, GeneratorOptions, OutputGenerator
 #   apidict - dictionary of <api> Elements keyed by API name
 #   extensions - list of <extension> Elements
 #   extdict - dictionary of <extension> Elements keyed by extension name
+#   handledict - dictionary of HandleInfo objects keyed by handle type name
+#   categorydict - dictionary of type categories keyed by type name
+#   categorytypes - dictionary of lists of type names, in registry order,
+#     keyed by type category (None for types without a category).
+#     This and the next five members are only used to query the
+#     registry, not by generators, so they're created by indexFeatures()
+#     when one of them is first read, and aren't saved in the cache.
+#   handlechildren - dictionary of lists of handle type names keyed by
+#     the name of their parent handle type
+#   dispatchcmds - dictionary of lists of command names keyed by the
+#     dispatchable handle type of their first parameter
+#   featuretypes / featurecmds - dictionaries of lists of type / command
+#     names in the <require> tags of a feature or extension, keyed by
+#     its name
+#   ownerdict - dictionary of the name of the feature or extension that
+#     first requires a type or command, keyed by the type / command name.
+#     Features are searched before extensions.
+#   structusers - dictionary of lists of the names of struct / union
+#     types with a member of a type, keyed by the type name. This and
+#     the next two members are created by indexTypeUsage() the first time
+#     typeContains() or commandsUsingType() is called, and are None until
+#     then. They aren't saved in the cache.
+#   cmdusers - dictionary of lists of the names of commands with a
+#     parameter of a type, keyed by the type name
+#   typeprops - dictionary of the properties of a type, keyed by the
+#     type name. Each is a frozenset of:
+#       'dispatchable' - a dispatchable handle, or a struct / union
+#         containing one, directly or in a nested struct / union
+#       'ndo' - likewise, for non-dispatchable handles
+#       'pointer' - a struct / union with a pointer member, directly or
+#         in a nested struct / union
+#     Types without any properties aren't listed. Properties are found
+#     over all the types in the registry, not those of one interface.
+#   extensionEnums - set of the <enum> Elements in <extension> <require>
+#     tags which extend an enum group. They're listed in that group's
+#     GroupInfo.enums instead, and aren't required or generated as part
+#     of the <require> tag.
+#   context - GenerationContext holding the required / declared state
+#     of the *Info objects for the interface being generated
+#   selections - dictionary of (features, apiMatch, context snapshot)
+#     tuples, the result of feature selection and Pass 1 of apiGen(),
+#     keyed by the generator options they depend on
+#   interfaceHashes - dictionary of the results of interfaceHash(), keyed
+#     by the same generator options
+#   supportedPatterns - dictionary of compiled regexps matching
+#     extension 'supported' attributes, keyed by the attribute
 #   gen - OutputGenerator object used to write headers / messages
 #   genOpts - GeneratorOptions object used to control which
 #     fetures to write and how to format them
@@ -176,9 +518,19 @@ from generator import write, GeneratorOptions, OutputGenerator
 #     or False to just treat them as emitted
 # Public methods
 #   loadElementTree(etree) - load registry from specified ElementTree
-#   loadFile(filename) - load registry from XML file
+#   loadFile(filename, cacheDir, stream) - load registry from XML file,
+#     using a registry cache in cacheDir (if not None), and the streaming
+#     loader if stream is True
+#   parseFileStream(filename) - parse XML file into an ElementTree with
+#     the streaming loader, which omits subtrees no generator reads
+#   loadCache(filename, cacheDir) - load the parsed registry for the XML
+#     file from a registry cache, if a current one exists
+#   saveCache(filename, cacheDir) - save the parsed registry for the XML
+#     file to a registry cache
 #   setGenerator(gen) - OutputGenerator to use
-#   parseTree() - parse the registry once loaded & create dictionaries
+#   parseTree() - parse the registry once loaded & create dictionaries.
+#     The ElementTree isn't modified, so one tree may be loaded into
+#     several Registry objects, including from different threads.
 #   dumpReg(maxlen, filehandle) - diagnostic to dump the dictionaries
 #     to specified file handle (default stdout). Truncates type /
 #     enum / command elements to maxlen characters (default 80)
@@ -186,10 +538,26 @@ from generator import write, GeneratorOptions, OutputGenerator
 #   apiGen(apiname, genOpts) - generate API headers for the API type
 #     and profile specified in genOpts, but only for the versions and
 #     extensions specified there.
-#   apiReset() - call between calls to apiGen() to reset internal state
+#   typeContains(typename, prop) - True if the type has a property
+#     in typeprops, such as 'ndo'
+#   commandsUsingType(typename) - names of the commands with a parameter
+#     of the type, or of a struct / union type containing it
+#   apiReset() - call between calls to apiGen() to reset internal state.
+#     Use context.snapshot() / context.restore() to save and return to
+#     the state after a generation instead.
 # Private methods
+#   cacheFileName(filename,cacheDir) - name of registry cache file
+#   indexFeatures() - create categorytypes, handlechildren, dispatchcmds,
+#     featuretypes, featurecmds and ownerdict
+#   featureIndex(name) - one of those, created on first use
+#   indexTypeUsage() - create structusers, cmdusers and typeprops
 #   addElementInfo(elem,info,infoName,dictionary) - add feature info to dict
+#   lookupRequiredFeature(fname,ftype,dictionary) - start generating a feature
+#   featureDependencies(f,ftype) - features a feature depends on
+#   declareFeature(f,fname,ftype) - emit a feature after its dependencies
 #   lookupElementInfo(fname,dictionary) - lookup feature info in dict
+#   supportedPattern(supported) - regexp matching a 'supported' attribute
+#   selectFeatures() - select the versions / extensions to generate
 class Registry:
     """Represents an API registry loaded from XML"""
     def __init__(self):
@@ -201,6 +569,17 @@ class Registry:
         self.apidict      = {}
         self.extensions   = []
         self.extdict      = {}
+        self.handledict   = {}
+        self.categorydict = {}
+        self.featureIndexes = None
+        self.structusers  = None
+        self.cmdusers     = None
+        self.typeprops    = None
+        self.extensionEnums = set()
+        self.context      = GenerationContext()
+        self.selections   = {}
+        self.interfaceHashes = {}
+        self.supportedPatterns = {}
         # A default output generator, so commands prior to apiGen can report
         # errors via the generator object.
         self.gen          = OutputGenerator()
@@ -210,10 +589,121 @@ class Registry:
         """Load ElementTree into a Registry object and parse it"""
         self.tree = tree
         self.parseTree()
-    def loadFile(self, file):
+    def loadFile(self, file, cacheDir = None, stream = False):
         """Load an API registry XML file into a Registry object and parse it"""
-        self.tree = etree.parse(file)
+        if (cacheDir != None and self.loadCache(file, cacheDir)):
+            return
+        if (stream):
+            self.tree = self.parseFileStream(file)
+        else:
+            self.tree = etree.parse(file)
         self.parseTree()
+        if (cacheDir != None):
+            self.saveCache(file, cacheDir)
+    #
+    # Streaming loader - parse the XML file incrementally, discarding the
+    # top-level subtrees no generator reads as soon as they close, and
+    # sharing a single copy of each whitespace-only text / tail string
+    # between elements (most of them are indentation). The result is a
+    # smaller ElementTree than etree.parse() makes, for somewhat more
+    # parsing time: on vk.xml, about 0.65MB less peak RSS for about 5ms
+    # more. Generators read the Elements of types, commands and features
+    # directly, so those are kept as Elements rather than reduced to
+    # records.
+    prunedElements = set([ 'comment', 'vendorids', 'tags' ])
+    def parseFileStream(self, file):
+        """Parse an API registry XML file into a compact ElementTree"""
+        intern = sys.intern
+        root = None
+        depth = 0
+        for event, elem in etree.iterparse(file, events=('start', 'end')):
+            if (event == 'start'):
+                if (root == None):
+                    root = elem
+                depth += 1
+                continue
+            depth -= 1
+            if (depth == 1 and elem.tag in self.prunedElements):
+                root.remove(elem)
+                continue
+            if (elem.text != None and elem.text.isspace()):
+                elem.text = intern(elem.text)
+            if (elem.tail != None and elem.tail.isspace()):
+                elem.tail = intern(elem.tail)
+        return etree.ElementTree(root)
+    #
+    # Registry cache - a pickled snapshot of the parsed dictionaries and
+    # the (already rewritten) ElementTree, so that repeated runs against
+    # the same XML file don't have to parse it again. Cache files are
+    # keyed by a hash of the XML file and of this module, so changes to
+    # either one invalidate the cache, and their names start with a hash
+    # of the XML file's path, so that a cache directory can be shared by
+    # several registries. Saving a snapshot only replaces older snapshots
+    # of the same file. pickle and tempfile are only imported when the
+    # cache is used, to keep startup fast.
+    cacheMembers = [ 'tree', 'typedict', 'groupdict', 'enumdict', 'cmddict',
+                     'apidict', 'extensions', 'extdict', 'handledict',
+                     'categorydict', 'extensionEnums', 'context' ]
+    cachePrefix = 'vkregistry-'
+    def cachePathPrefix(self, file):
+        pathHash = hashlib.sha256(os.path.abspath(file).encode('utf-8'))
+        return self.cachePrefix + pathHash.hexdigest()[0:16] + '-'
+    def cacheFileName(self, file, cacheDir):
+        hash = hashlib.sha256()
+        for source in [ file, __file__ ]:
+            with open(source, 'rb') as f:
+                hash.update(f.read())
+        return os.path.join(cacheDir, self.cachePathPrefix(file) + hash.hexdigest() + '.pickle')
+    def loadCache(self, file, cacheDir):
+        """Load a parsed registry from the cache. Returns True if successful"""
+        import pickle
+        filename = self.cacheFileName(file, cacheDir)
+        try:
+            with open(filename, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return False
+        for member in self.cacheMembers:
+            setattr(self, member, state[member])
+        self.reg = self.tree.getroot()
+        self.featureIndexes = None
+        self.structusers = self.cmdusers = self.typeprops = None
+        self.selections = {}
+        self.interfaceHashes = {}
+        return True
+    def saveCache(self, file, cacheDir):
+        """Save the parsed registry to the cache, replacing older snapshots"""
+        import pickle, tempfile
+        filename = self.cacheFileName(file, cacheDir)
+        prefix = self.cachePathPrefix(file)
+        state = dict([(member, getattr(self, member)) for member in self.cacheMembers])
+        tmpname = None
+        try:
+            if not os.path.exists(cacheDir):
+                os.makedirs(cacheDir)
+            # Write to a temporary file and rename it into place, so that
+            # concurrent builds never see a partially written snapshot
+            (fd, tmpname) = tempfile.mkstemp(dir=cacheDir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpname, filename)
+            tmpname = None
+            for name in os.listdir(cacheDir):
+                stale = os.path.join(cacheDir, name)
+                if (name.startswith(prefix) and stale != filename):
+                    try:
+                        os.remove(stale)
+                    except OSError:
+                        # Already replaced by a concurrent build
+                        pass
+        except (OSError, pickle.PicklingError) as e:
+            self.gen.logMsg('warn', '*** Unable to write registry cache', filename, ':', e)
+        finally:
+            if (tmpname != None):
+                try:
+                    os.remove(tmpname)
+                except OSError:
+                    pass
     def setGenerator(self, gen):
         """Specify output generator object. None restores the default generator"""
         self.gen = gen
@@ -229,10 +719,10 @@ class Registry:
     # tuple (name,api). If not, the key is the name. 'name' is an
     # attribute of the Element
     def addElementInfo(self, elem, info, infoName, dictionary):
-        if ('api' in elem.attrib):
-            key = (elem.get('name'),elem.get('api'))
+        if (info.api != None):
+            key = (info.name, info.api)
         else:
-            key = elem.get('name')
+            key = info.name
         if key in dictionary:
             self.gen.logMsg('warn', '*** Attempt to redefine',
                             infoName, 'with key:', key)
@@ -257,20 +747,31 @@ class Registry:
         """Parse the registry Element, once created"""
         # This must be the Element for the root <registry>
         self.reg = self.tree.getroot()
+        self.featureIndexes = None
+        self.structusers = self.cmdusers = self.typeprops = None
+        self.selections = {}
+        self.interfaceHashes = {}
         #
-        # Create dictionary of registry types from toplevel <types> tags
-        # and add 'name' attribute to each <type> tag (where missing)
-        # based on its <name> element.
+        # Create dictionary of registry types from toplevel <types> tags.
+        # Types without a 'name' attribute are named from the contents of
+        # their <name> tag.
         #
         # There's usually one <types> block; more are OK
         # Required <type> attributes: 'name' or nested <name> tag contents
+        # Handle types and type categories are also indexed by name. Where
+        # a name is defined more than once, the first definition wins.
         self.typedict = {}
+        self.handledict = {}
+        self.categorydict = {}
         for type in self.reg.findall('types/type'):
-            # If the <type> doesn't already have a 'name' attribute, set
-            # it from contents of its <name> tag.
-            if (type.get('name') == None):
-                type.attrib['name'] = type.find('name').text
-            self.addElementInfo(type, TypeInfo(type), 'type', self.typedict)
+            typeInfo = TypeInfo(type)
+            self.addElementInfo(type, typeInfo, 'type', self.typedict)
+            self.categorydict.setdefault(typeInfo.name, typeInfo.category)
+            nameElem = type.find('name')
+            if (nameElem != None):
+                self.categorydict.setdefault(nameElem.text, typeInfo.category)
+                if (typeInfo.category == 'handle' and nameElem.text not in self.handledict):
+                    self.handledict[nameElem.text] = HandleInfo(type)
         #
         # Create dictionary of registry enum groups from <enums> tags.
         #
@@ -278,8 +779,11 @@ class Registry:
         # generated, but that group can't be identified and turned into an
         # enum type definition - it's just a container for <enum> tags.
         self.groupdict = {}
+        groups = []
         for group in self.reg.findall('enums'):
-            self.addElementInfo(group, GroupInfo(group), 'group', self.groupdict)
+            groupInfo = GroupInfo(group)
+            groups.append(groupInfo)
+            self.addElementInfo(group, groupInfo, 'group', self.groupdict)
         #
         # Create dictionary of registry enums from <enum> tags
         #
@@ -291,25 +795,24 @@ class Registry:
         # tag all contained <enum>s are required. This is a stopgap until
         # a better scheme for tagging core and extension enums is created.
         self.enumdict = {}
-        for enums in self.reg.findall('enums'):
-            required = (enums.get('type') != None)
-            for enum in enums.findall('enum'):
+        self.context = GenerationContext()
+        for groupInfo in groups:
+            required = (groupInfo.elem.get('type') != None)
+            for enum in groupInfo.elem.findall('enum'):
                 enumInfo = EnumInfo(enum)
-                enumInfo.required = required
+                if (required):
+                    self.context.require(enumInfo, required)
+                groupInfo.enums.append(enumInfo)
                 self.addElementInfo(enum, enumInfo, 'enum', self.enumdict)
         #
-        # Create dictionary of registry commands from <command> tags
-        # and add 'name' attribute to each <command> tag (where missing)
-        # based on its <proto><name> element.
+        # Create dictionary of registry commands from <command> tags.
+        # Commands without a 'name' attribute are named from the contents
+        # of their <proto><name> tag.
         #
         # There's usually only one <commands> block; more are OK.
         # Required <command> attributes: 'name' or <proto><name> tag contents
         self.cmddict = {}
         for cmd in self.reg.findall('commands/command'):
-            # If the <command> doesn't already have a 'name' attribute, set
-            # it from contents of its <proto><name> tag.
-            if (cmd.get('name') == None):
-                cmd.attrib['name'] = cmd.find('proto/name').text
             ci = CmdInfo(cmd)
             self.addElementInfo(cmd, ci, 'command', self.cmddict)
         #
@@ -322,29 +825,25 @@ class Registry:
             self.addElementInfo(feature, featureInfo, 'feature', self.apidict)
         self.extensions = self.reg.findall('extensions/extension')
         self.extdict = {}
+        self.extensionEnums = set()
         for feature in self.extensions:
             featureInfo = FeatureInfo(feature)
             self.addElementInfo(feature, featureInfo, 'extension', self.extdict)
 
             # Add additional enums defined only in <extension> tags
             # to the corresponding core type.
-            # When seen here, the <enum> element, processed to contain the
-            # numeric enum value, is added to the corresponding <enums>
-            # element, as well as adding to the enum dictionary. It is
-            # *removed* from the <require> element it is introduced in.
-            # Not doing this will cause spurious genEnum()
+            # When seen here, the EnumInfo for the <enum> element, with
+            # the extension number, name and 'supported' attribute used
+            # for enumerant value calculation and selection, is added to
+            # the corresponding GroupInfo as well as to the enum
+            # dictionary. The element is recorded in extensionEnums, so
+            # it's skipped when processing the <require> tag it is
+            # introduced in. Not doing this will cause spurious genEnum()
             # calls to be made in output generation, and it's easier
             # to handle here than in genEnum().
             #
-            # In lxml.etree, an Element can have only one parent, so the
-            # append() operation also removes the element. But in Python's
-            # ElementTree package, an Element can have multiple parents. So
-            # it must be explicitly removed from the <require> tag, leading
-            # to the nested loop traversal of <require>/<enum> elements
-            # below.
-            #
-            # This code also adds a 'extnumber' attribute containing the
-            # extension number, used for enumerant value calculation.
+            # The elements themselves are left where they are, so the
+            # ElementTree is never modified by parsing it.
             #
             # For <enum> tags which are actually just constants, if there's
             # no 'extends' tag but there is a 'value' or 'bitpos' tag, just
@@ -359,34 +858,152 @@ class Registry:
             for elem in feature.findall('require'):
               for enum in elem.findall('enum'):
                 addEnumInfo = False
-                groupName = enum.get('extends')
+                enumInfo = EnumInfo(enum)
+                groupName = enumInfo.extends
                 if (groupName != None):
                     # self.gen.logMsg('diag', '*** Found extension enum',
-                    #     enum.get('name'))
-                    # Add extension number attribute to the <enum> element
-                    enum.attrib['extnumber'] = featureInfo.number
-                    enum.attrib['extname'] = featureInfo.name
-                    enum.attrib['supported'] = featureInfo.supported
+                    #     enumInfo.name)
+                    # Record the extension defining the enum
+                    enumInfo.extnumber = featureInfo.number
+                    enumInfo.extname = featureInfo.name
+                    enumInfo.supported = featureInfo.supported
                     # Look up the GroupInfo with matching groupName
-                    if (groupName in self.groupdict.keys()):
+                    if (groupName in self.groupdict):
                         # self.gen.logMsg('diag', '*** Matching group',
                         #     groupName, 'found, adding element...')
-                        gi = self.groupdict[groupName]
-                        gi.elem.append(enum)
-                        # Remove element from parent <require> tag
-                        # This should be a no-op in lxml.etree
-                        elem.remove(enum)
+                        self.groupdict[groupName].enums.append(enumInfo)
+                        self.extensionEnums.add(enum)
                     else:
                         self.gen.logMsg('warn', '*** NO matching group',
-                            groupName, 'for enum', enum.get('name'), 'found.')
+                            groupName, 'for enum', enumInfo.name, 'found.')
                     addEnumInfo = True
-                elif (enum.get('value') or enum.get('bitpos')):
+                elif (enumInfo.value or enumInfo.bitpos):
                     # self.gen.logMsg('diag', '*** Adding extension constant "enum"',
-                    #     enum.get('name'))
+                    #     enumInfo.name)
                     addEnumInfo = True
                 if (addEnumInfo):
-                    enumInfo = EnumInfo(enum)
                     self.addElementInfo(enum, enumInfo, 'enum', self.enumdict)
+    #
+    # indexFeatures - list type names by category, handle types by parent
+    # and commands by the dispatchable handle type of their first
+    # parameter, list the types and commands required by each feature and
+    # extension, and index the first one requiring each of them.
+    def indexFeatures(self):
+        categorytypes = {}
+        named = set()
+        for type in self.reg.findall('types/type'):
+            name = type.get('name') or type.find('name').text
+            if (name not in named):
+                named.add(name)
+                categorytypes.setdefault(type.get('category'), []).append(name)
+        handlechildren = {}
+        for name, handle in self.handledict.items():
+            if (handle.parent != None):
+                for parent in handle.parent.split(','):
+                    handlechildren.setdefault(parent, []).append(name)
+        dispatchcmds = {}
+        for ci in self.cmddict.values():
+            if (ci.signature.params):
+                handle = self.handledict.get(ci.signature.params[0].type)
+                if (handle != None and handle.dispatchable):
+                    dispatchcmds.setdefault(ci.signature.params[0].type, []).append(ci.name)
+        featuretypes = {}
+        featurecmds = {}
+        ownerdict = {}
+        for feature in self.reg.findall('feature') + self.extensions:
+            name = feature.get('name')
+            types = featuretypes.setdefault(name, [])
+            cmds = featurecmds.setdefault(name, [])
+            for require in feature.findall('require'):
+                for type in require.findall('type'):
+                    types.append(type.get('name'))
+                    ownerdict.setdefault(type.get('name'), name)
+                for cmd in require.findall('command'):
+                    cmds.append(cmd.get('name'))
+                    ownerdict.setdefault(cmd.get('name'), name)
+        self.featureIndexes = { 'categorytypes' : categorytypes,
+                                'handlechildren' : handlechildren,
+                                'dispatchcmds' : dispatchcmds,
+                                'featuretypes' : featuretypes,
+                                'featurecmds' : featurecmds,
+                                'ownerdict' : ownerdict }
+    def featureIndex(self, name):
+        if (self.featureIndexes == None):
+            self.indexFeatures()
+        return self.featureIndexes[name]
+    categorytypes = property(lambda self: self.featureIndex('categorytypes'))
+    handlechildren = property(lambda self: self.featureIndex('handlechildren'))
+    dispatchcmds = property(lambda self: self.featureIndex('dispatchcmds'))
+    featuretypes = property(lambda self: self.featureIndex('featuretypes'))
+    featurecmds = property(lambda self: self.featureIndex('featurecmds'))
+    ownerdict = property(lambda self: self.featureIndex('ownerdict'))
+    #
+    # indexTypeUsage - index which struct / union types and commands use
+    # each type, and find the properties of each type. Properties of
+    # handles and pointer members are propagated to the structs using
+    # them, back along structusers, until nothing changes, so nested and
+    # mutually referring structs are handled.
+    def indexTypeUsage(self):
+        self.structusers = {}
+        self.cmdusers = {}
+        props = {}
+        for type in self.typedict.values():
+            if (type.layout == None):
+                continue
+            users = set()
+            for member in type.layout.members:
+                if (member.type not in users):
+                    users.add(member.type)
+                    self.structusers.setdefault(member.type, []).append(type.name)
+                if (member.tailPointer):
+                    props.setdefault(type.name, set()).add('pointer')
+        for cmd in self.cmddict.values():
+            users = set()
+            for param in cmd.signature.params:
+                if (param.type not in users):
+                    users.add(param.type)
+                    self.cmdusers.setdefault(param.type, []).append(cmd.name)
+        for name, handle in self.handledict.items():
+            props[name] = set(['dispatchable' if handle.dispatchable else 'ndo'])
+        pending = list(props)
+        while (pending):
+            name = pending.pop()
+            for user in self.structusers.get(name, []):
+                userProps = props.setdefault(user, set())
+                if (not props[name] <= userProps):
+                    userProps |= props[name]
+                    pending.append(user)
+        self.typeprops = dict([(name, frozenset(typeProps))
+                               for name, typeProps in props.items() if typeProps])
+    #
+    # typeContains - return True if a type has the property prop (see
+    # typeprops), e.g. typeContains('VkSubmitInfo', 'ndo')
+    # This covers every type in the registry, whatever is being generated.
+    # A generator which only handles the structs of the current feature,
+    # like the unique objects generator, must not use it in place of its
+    # own analysis, or it will find properties of structs it never sees.
+    def typeContains(self, typename, prop):
+        if (self.typeprops == None):
+            self.indexTypeUsage()
+        return prop in self.typeprops.get(typename, ())
+    #
+    # commandsUsingType - return the set of names of commands with a
+    # parameter of type typename, or of a struct / union type containing
+    # it (directly or in a nested struct / union).
+    def commandsUsingType(self, typename):
+        if (self.typeprops == None):
+            self.indexTypeUsage()
+        cmds = set()
+        visited = set([typename])
+        pending = [typename]
+        while (pending):
+            name = pending.pop()
+            cmds.update(self.cmdusers.get(name, []))
+            for user in self.structusers.get(name, []):
+                if (user not in visited):
+                    visited.add(user)
+                    pending.append(user)
+        return cmds
     def dumpReg(self, maxlen = 40, filehandle = sys.stdout):
         """Dump all the dictionaries constructed from the Registry object"""
         write('***************************************', file=filehandle)
@@ -423,44 +1040,51 @@ class Registry:
     #
     # typename - name of type
     # required - boolean (to tag features as required or not)
+    # The type's dependencies are walked iteratively, visiting each type
+    # once, so shared and cyclic dependencies are only tagged once.
     def markTypeRequired(self, typename, required):
         """Require (along with its dependencies) or remove (but not its dependencies) a type"""
-        self.gen.logMsg('diag', '*** tagging type:', typename, '-> required =', required)
-        # Get TypeInfo object for <type> tag corresponding to typename
-        type = self.lookupElementInfo(typename, self.typedict)
-        if (type != None):
-            if (required):
-                # Tag type dependencies in 'required' attributes as
-                # required. This DOES NOT un-tag dependencies in a <remove>
-                # tag. See comments in markRequired() below for the reason.
-                if ('requires' in type.elem.attrib):
-                    depType = type.elem.get('requires')
-                    self.gen.logMsg('diag', '*** Generating dependent type',
-                        depType, 'for type', typename)
-                    self.markTypeRequired(depType, required)
-                # Tag types used in defining this type (e.g. in nested
-                # <type> tags)
-                # Look for <type> in entire <command> tree,
-                # not just immediate children
-                for subtype in type.elem.findall('.//type'):
-                    self.gen.logMsg('diag', '*** markRequired: type requires dependent <type>', subtype.text)
-                    self.markTypeRequired(subtype.text, required)
-                # Tag enums used in defining this type, for example in
-                #   <member><name>member</name>[<enum>MEMBER_SIZE</enum>]</member>
-                for subenum in type.elem.findall('.//enum'):
-                    self.gen.logMsg('diag', '*** markRequired: type requires dependent <enum>', subenum.text)
-                    self.markEnumRequired(subenum.text, required)
-            type.required = required
-        else:
-            self.gen.logMsg('warn', '*** type:', typename , 'IS NOT DEFINED')
+        visited = set()
+        pending = [typename]
+        while (pending):
+            typename = pending.pop()
+            if (typename in visited):
+                continue
+            visited.add(typename)
+            self.gen.diag('*** tagging type:', typename, '-> required =', required)
+            # Get TypeInfo object for <type> tag corresponding to typename
+            type = self.lookupElementInfo(typename, self.typedict)
+            if (type != None):
+                if (required):
+                    # Tag type dependencies in 'required' attributes as
+                    # required. This DOES NOT un-tag dependencies in a <remove>
+                    # tag. See comments in markRequired() below for the reason.
+                    # Tag types used in defining this type (e.g. in nested
+                    # <type> tags) too. They're pushed in reverse order, so
+                    # they're tagged in the same order as they're found.
+                    for subtype in reversed(type.subtypes):
+                        self.gen.diag('*** markRequired: type requires dependent <type>', subtype)
+                        pending.append(subtype)
+                    if (type.requires != None):
+                        self.gen.diag('*** Generating dependent type',
+                            type.requires, 'for type', typename)
+                        pending.append(type.requires)
+                    # Tag enums used in defining this type, for example in
+                    #   <member><name>member</name>[<enum>MEMBER_SIZE</enum>]</member>
+                    for subenum in type.subenums:
+                        self.gen.diag('*** markRequired: type requires dependent <enum>', subenum)
+                        self.markEnumRequired(subenum, required)
+                self.context.require(type, required)
+            else:
+                self.gen.logMsg('warn', '*** type:', typename , 'IS NOT DEFINED')
     #
     # enumname - name of enum
     # required - boolean (to tag features as required or not)
     def markEnumRequired(self, enumname, required):
-        self.gen.logMsg('diag', '*** tagging enum:', enumname, '-> required =', required)
+        self.gen.diag('*** tagging enum:', enumname, '-> required =', required)
         enum = self.lookupElementInfo(enumname, self.enumdict)
         if (enum != None):
-            enum.required = required
+            self.context.require(enum, required)
         else:
             self.gen.logMsg('warn', '*** enum:', enumname , 'IS NOT DEFINED')
     #
@@ -468,31 +1092,32 @@ class Registry:
     # required - boolean (to tag features as required or not)
     def markRequired(self, features, required):
         """Require or remove features specified in the Element"""
-        self.gen.logMsg('diag', '*** markRequired (features = <too long to print>, required =', required, ')')
+        self.gen.diag('*** markRequired (features = <too long to print>, required =', required, ')')
         # Loop over types, enums, and commands in the tag
         # @@ It would be possible to respect 'api' and 'profile' attributes
         #  in individual features, but that's not done yet.
         for typeElem in features.findall('type'):
             self.markTypeRequired(typeElem.get('name'), required)
         for enumElem in features.findall('enum'):
-            self.markEnumRequired(enumElem.get('name'), required)
+            if (enumElem not in self.extensionEnums):
+                self.markEnumRequired(enumElem.get('name'), required)
         for cmdElem in features.findall('command'):
             name = cmdElem.get('name')
-            self.gen.logMsg('diag', '*** tagging command:', name, '-> required =', required)
+            self.gen.diag('*** tagging command:', name, '-> required =', required)
             cmd = self.lookupElementInfo(name, self.cmddict)
             if (cmd != None):
-                cmd.required = required
+                self.context.require(cmd, required)
                 # Tag all parameter types of this command as required.
                 # This DOES NOT remove types of commands in a <remove>
                 # tag, because many other commands may use the same type.
                 # We could be more clever and reference count types,
                 # instead of using a boolean.
                 if (required):
-                    # Look for <type> in entire <command> tree,
+                    # Use <type>s in entire <command> tree,
                     # not just immediate children
-                    for type in cmd.elem.findall('.//type'):
-                        self.gen.logMsg('diag', '*** markRequired: command implicitly requires dependent type', type.text)
-                        self.markTypeRequired(type.text, required)
+                    for type in cmd.subtypes:
+                        self.gen.diag('*** markRequired: command implicitly requires dependent type', type)
+                        self.markTypeRequired(type, required)
             else:
                 self.gen.logMsg('warn', '*** command:', name, 'IS NOT DEFINED')
     #
@@ -518,9 +1143,9 @@ class Registry:
             if (matchAPIProfile(api, profile, feature)):
                 for v in feature.findall('usage'):
                     if v.get('command'):
-                        self.cmddict[v.get('command')].additionalValidity.append(copy.deepcopy(v))
+                        self.context.addValidity(self.cmddict[v.get('command')], copy.deepcopy(v))
                     if v.get('struct'):
-                        self.typedict[v.get('struct')].additionalValidity.append(copy.deepcopy(v))
+                        self.context.addValidity(self.typedict[v.get('struct')], copy.deepcopy(v))
 
         #
         # Loop over all usage inside all <remove> tags.
@@ -528,85 +1153,131 @@ class Registry:
             if (matchAPIProfile(api, profile, feature)):
                 for v in feature.findall('usage'):
                     if v.get('command'):
-                        self.cmddict[v.get('command')].removedValidity.append(copy.deepcopy(v))
+                        self.context.removeValidity(self.cmddict[v.get('command')], copy.deepcopy(v))
                     if v.get('struct'):
-                        self.typedict[v.get('struct')].removedValidity.append(copy.deepcopy(v))
+                        self.context.removeValidity(self.typedict[v.get('struct')], copy.deepcopy(v))
 
     #
-    # generateFeature - generate a single type / enum group / enum / command,
-    # and all its dependencies as needed.
+    # lookupRequiredFeature - look up a type / enum / command to generate, returning
+    # its *Info object, or None if it's undefined, not required or has
+    # already been declared. The feature is marked declared, as though
+    # actually emitted.
     #   fname - name of feature (<type>/<enum>/<command>)
     #   ftype - type of feature, 'type' | 'enum' | 'command'
     #   dictionary - of *Info objects - self.{type|enum|cmd}dict
-    def generateFeature(self, fname, ftype, dictionary):
+    def lookupRequiredFeature(self, fname, ftype, dictionary):
         f = self.lookupElementInfo(fname, dictionary)
         if (f == None):
             # No such feature. This is an error, but reported earlier
-            self.gen.logMsg('diag', '*** No entry found for feature', fname,
-                            'returning!')
-            return
+            self.gen.diag('*** No entry found for feature', fname,
+                          'returning!')
+            return None
         #
         # If feature isn't required, or has already been declared, return
         if (not f.required):
-            self.gen.logMsg('diag', '*** Skipping', ftype, fname, '(not required)')
-            return
+            self.gen.diag('*** Skipping', ftype, fname, '(not required)')
+            return None
         if (f.declared):
-            self.gen.logMsg('diag', '*** Skipping', ftype, fname, '(already declared)')
-            return
+            self.gen.diag('*** Skipping', ftype, fname, '(already declared)')
+            return None
         # Always mark feature declared, as though actually emitted
-        f.declared = True
-        #
-        # Pull in dependent declaration(s) of the feature.
-        # For types, there may be one type in the 'required' attribute of
-        #   the element, as well as many in imbedded <type> and <enum> tags
-        #   within the element.
-        # For commands, there may be many in <type> tags within the element.
-        # For enums, no dependencies are allowed (though perhaps if you
-        #   have a uint64 enum, it should require that type).
+        self.context.declare(f)
+        return f
+    #
+    # featureDependencies - yield the dependent declaration(s) of a feature,
+    # as (name, type, dictionary) tuples, in the order they're generated.
+    # For types, there may be one type in the 'required' attribute of
+    #   the element, as well as many in imbedded <type> and <enum> tags
+    #   within the element.
+    # For commands, there may be many in <type> tags within the element.
+    # For enums, no dependencies are allowed (though perhaps if you
+    #   have a uint64 enum, it should require that type).
+    def featureDependencies(self, f, ftype):
+        if (ftype == 'type'):
+            if (f.requires != None):
+                self.gen.diag('*** Generating required dependent type',
+                              f.requires)
+                yield (f.requires, 'type', self.typedict)
+            for subtype in f.subtypes:
+                self.gen.diag('*** Generating required dependent <type>',
+                    subtype)
+                yield (subtype, 'type', self.typedict)
+            for subenum in f.subenums:
+                self.gen.diag('*** Generating required dependent <enum>',
+                    subenum)
+                yield (subenum, 'enum', self.enumdict)
+        elif (ftype == 'command'):
+            for subtype in f.subtypes:
+                self.gen.diag('*** Generating required parameter type',
+                              subtype)
+                yield (subtype, 'type', self.typedict)
+    #
+    # declareFeature - emit a feature once all its dependencies have been
+    # generated.
+    #   f - *Info object returned by lookupRequiredFeature()
+    #   fname, ftype - as for lookupRequiredFeature()
+    def declareFeature(self, f, fname, ftype):
         genProc = None
         if (ftype == 'type'):
             genProc = self.gen.genType
-            if ('requires' in f.elem.attrib):
-                depname = f.elem.get('requires')
-                self.gen.logMsg('diag', '*** Generating required dependent type',
-                                depname)
-                self.generateFeature(depname, 'type', self.typedict)
-            for subtype in f.elem.findall('.//type'):
-                self.gen.logMsg('diag', '*** Generating required dependent <type>',
-                    subtype.text)
-                self.generateFeature(subtype.text, 'type', self.typedict)
-            for subtype in f.elem.findall('.//enum'):
-                self.gen.logMsg('diag', '*** Generating required dependent <enum>',
-                    subtype.text)
-                self.generateFeature(subtype.text, 'enum', self.enumdict)
             # If the type is an enum group, look up the corresponding
             # group in the group dictionary and generate that instead.
-            if (f.elem.get('category') == 'enum'):
-                self.gen.logMsg('diag', '*** Type', fname, 'is an enum group, so generate that instead')
+            if (f.category == 'enum'):
+                self.gen.diag('*** Type', fname, 'is an enum group, so generate that instead')
                 group = self.lookupElementInfo(fname, self.groupdict)
                 if (group == None):
                     # Unless this is tested for, it's probably fatal to call below
                     genProc = None
-                    self.logMsg('warn', '*** NO MATCHING ENUM GROUP FOUND!!!')
+                    self.gen.logMsg('warn', '*** NO MATCHING ENUM GROUP FOUND!!!')
                 else:
                     genProc = self.gen.genGroup
                     f = group
         elif (ftype == 'command'):
             genProc = self.gen.genCmd
-            for type in f.elem.findall('.//type'):
-                depname = type.text
-                self.gen.logMsg('diag', '*** Generating required parameter type',
-                                depname)
-                self.generateFeature(depname, 'type', self.typedict)
         elif (ftype == 'enum'):
             genProc = self.gen.genEnum
         # Actually generate the type only if emitting declarations
         if self.emitFeatures:
-            self.gen.logMsg('diag', '*** Emitting', ftype, 'decl for', fname)
+            self.gen.diag('*** Emitting', ftype, 'decl for', fname)
             genProc(f, fname)
         else:
-            self.gen.logMsg('diag', '*** Skipping', ftype, fname,
-                            '(not emitting this feature)')
+            self.gen.diag('*** Skipping', ftype, fname,
+                          '(not emitting this feature)')
+    #
+    # generateFeature - generate a single type / enum group / enum / command,
+    # and all its dependencies as needed.
+    #   fname - name of feature (<type>/<enum>/<command>)
+    #   ftype - type of feature, 'type' | 'enum' | 'command'
+    #   dictionary - of *Info objects - self.{type|enum|cmd}dict
+    # The dependency graph is walked depth-first with an explicit stack, so
+    # dependencies are still emitted before the features that use them,
+    # without recursing. A dependency on a feature that's still on the
+    # stack is a cycle; it's reported, and broken by not generating the
+    # dependency again.
+    def generateFeature(self, fname, ftype, dictionary):
+        f = self.lookupRequiredFeature(fname, ftype, dictionary)
+        if (f == None):
+            return
+        stack = [(f, fname, ftype, self.featureDependencies(f, ftype))]
+        active = set([(fname, ftype)])
+        while (stack):
+            f, fname, ftype, dependencies = stack[-1]
+            dependency = next(dependencies, None)
+            if (dependency != None):
+                depname, deptype, depdict = dependency
+                if ((depname, deptype) in active):
+                    self.gen.diag('*** Dependency cycle:', deptype, depname,
+                                  'is required by', ftype, fname, 'which it requires')
+                    continue
+                depf = self.lookupRequiredFeature(depname, deptype, depdict)
+                if (depf != None):
+                    stack.append((depf, depname, deptype,
+                                  self.featureDependencies(depf, deptype)))
+                    active.add((depname, deptype))
+                continue
+            stack.pop()
+            active.discard((fname, ftype))
+            self.declareFeature(f, fname, ftype)
     #
     # generateRequiredInterface - generate all interfaces required
     # by an API version or extension
@@ -620,26 +1291,26 @@ class Registry:
             for t in features.findall('type'):
                 self.generateFeature(t.get('name'), 'type', self.typedict)
             for e in features.findall('enum'):
-                self.generateFeature(e.get('name'), 'enum', self.enumdict)
+                if (e not in self.extensionEnums):
+                    self.generateFeature(e.get('name'), 'enum', self.enumdict)
             for c in features.findall('command'):
                 self.generateFeature(c.get('name'), 'command', self.cmddict)
 
     #
-    # apiGen(genOpts) - generate interface for specified versions
-    #   genOpts - GeneratorOptions object with parameters used
-    #   by the Generator object.
-    def apiGen(self, genOpts):
-        """Generate interfaces for the specified API type and range of versions"""
-        #
-        self.gen.logMsg('diag', '*******************************************')
-        self.gen.logMsg('diag', '  Registry.apiGen file:', genOpts.filename,
-                        'api:', genOpts.apiname,
-                        'profile:', genOpts.profile)
-        self.gen.logMsg('diag', '*******************************************')
-        #
-        self.genOpts = genOpts
-        # Reset required/declared flags for all features
-        self.apiReset()
+    # supportedPattern - return the compiled regexp matching the whole of
+    # an extension's 'supported' attribute. Memoized.
+    def supportedPattern(self, supported):
+        pattern = self.supportedPatterns.get(supported)
+        if (pattern == None):
+            pattern = re.compile('^(' + supported + ')$')
+            self.supportedPatterns[supported] = pattern
+        return pattern
+    #
+    # selectFeatures - return the list of FeatureInfo objects for the API
+    # versions and extensions selected by self.genOpts, in generation
+    # order, and whether any API version matched the API being generated.
+    # Their 'emit' flags are set.
+    def selectFeatures(self):
         #
         # Compile regexps used to select versions & extensions
         regVersions = re.compile(self.genOpts.versions)
@@ -652,29 +1323,27 @@ class Registry:
         apiMatch = False
         for key in self.apidict:
             fi = self.apidict[key]
-            api = fi.elem.get('api')
+            api = fi.api
             if (api == self.genOpts.apiname):
                 apiMatch = True
                 if (regVersions.match(fi.version)):
                     # Matches API & version #s being generated. Mark for
                     # emission and add to the features[] list .
                     # @@ Could use 'declared' instead of 'emit'?
-                    fi.emit = (regEmitVersions.match(fi.version) != None)
+                    self.context.emit(fi, regEmitVersions.match(fi.version) != None)
                     features.append(fi)
                     if (not fi.emit):
-                        self.gen.logMsg('diag', '*** NOT tagging feature api =', api,
+                        self.gen.diag('*** NOT tagging feature api =', api,
                             'name =', fi.name, 'version =', fi.version,
                             'for emission (does not match emitversions pattern)')
                 else:
-                    self.gen.logMsg('diag', '*** NOT including feature api =', api,
+                    self.gen.diag('*** NOT including feature api =', api,
                         'name =', fi.name, 'version =', fi.version,
                         '(does not match requested versions)')
             else:
-                self.gen.logMsg('diag', '*** NOT including feature api =', api,
+                self.gen.diag('*** NOT including feature api =', api,
                     'name =', fi.name,
                     '(does not match requested API)')
-        if (not apiMatch):
-            self.gen.logMsg('warn', '*** No matching API versions found!')
         #
         # Get all matching extensions, in order by their extension number,
         # and add to the list of features.
@@ -690,10 +1359,9 @@ class Registry:
             # 'supported' attribute matches defaultExtensions. The regexp in
             # 'supported' must exactly match defaultExtensions, so bracket
             # it with ^(pat)$.
-            pat = '^(' + ei.elem.get('supported') + ')$'
             if (self.genOpts.defaultExtensions and
-                     re.match(pat, self.genOpts.defaultExtensions)):
-                self.gen.logMsg('diag', '*** Including extension',
+                     self.supportedPattern(ei.supported).match(self.genOpts.defaultExtensions)):
+                self.gen.diag('*** Including extension',
                     extName, "(defaultExtensions matches the 'supported' attribute)")
                 include = True
             #
@@ -702,7 +1370,7 @@ class Registry:
             # forcing extensions into an interface even if they're not
             # tagged appropriately in the registry.
             if (regAddExtensions.match(extName) != None):
-                self.gen.logMsg('diag', '*** Including extension',
+                self.gen.diag('*** Including extension',
                     extName, '(matches explicitly requested extensions to add)')
                 include = True
             # Remove extensions if the name matches the regexp specified
@@ -710,50 +1378,130 @@ class Registry:
             # extensions from an interface even if they're tagged that
             # way in the registry.
             if (regRemoveExtensions.match(extName) != None):
-                self.gen.logMsg('diag', '*** Removing extension',
+                self.gen.diag('*** Removing extension',
                     extName, '(matches explicitly requested extensions to remove)')
                 include = False
             #
             # If the extension is to be included, add it to the
             # extension features list.
             if (include):
-                ei.emit = True
+                self.context.emit(ei, True)
                 features.append(ei)
             else:
-                self.gen.logMsg('diag', '*** NOT including extension',
+                self.gen.diag('*** NOT including extension',
                     extName, '(does not match api attribute or explicitly requested extensions)')
         #
         # Sort the extension features list, if a sort procedure is defined
         if (self.genOpts.sortProcedure):
             self.genOpts.sortProcedure(features)
-        #
-        # Pass 1: loop over requested API versions and extensions tagging
-        #   types/commands/features as required (in an <require> block) or no
-        #   longer required (in an <remove> block). It is possible to remove
-        #   a feature in one version and restore it later by requiring it in
-        #   a later version.
-        # If a profile other than 'None' is being generated, it must
-        #   match the profile attribute (if any) of the <require> and
-        #   <remove> tags.
-        self.gen.logMsg('diag', '*** PASS 1: TAG FEATURES ********************************************')
+        return (features, apiMatch)
+    #
+    # selectionKey(genOpts) - return the options of genOpts that feature
+    #   selection and Pass 1 of apiGen() depend on, as a tuple
+    def selectionKey(self, genOpts):
+        return (genOpts.apiname, genOpts.profile,
+                genOpts.versions, genOpts.emitversions,
+                genOpts.defaultExtensions, genOpts.addExtensions,
+                genOpts.removeExtensions, genOpts.sortProcedure)
+    #
+    # selectAndTagFeatures - select the API versions and extensions to
+    #   generate for self.genOpts, and tag their required features (Pass 1
+    #   of apiGen()). Both depend only on the selection options, and all
+    #   targets usually share those, so the results are kept and restored
+    #   for later calls with the same options. Returns the list of selected
+    #   FeatureInfo objects.
+    def selectAndTagFeatures(self):
+        """Select features for self.genOpts and tag what they require"""
+        selectionKey = self.selectionKey(self.genOpts)
+        selection = self.selections.get(selectionKey)
+        if (selection != None):
+            self.gen.diag('*** Reusing feature selection and required features',
+                          'of an earlier generation with the same options')
+            (features, apiMatch, snapshot) = selection
+            self.context.restore(snapshot)
+            if (not apiMatch):
+                self.gen.logMsg('warn', '*** No matching API versions found!')
+        else:
+            # Reset required/declared flags for all features
+            self.apiReset()
+            (features, apiMatch) = self.selectFeatures()
+            if (not apiMatch):
+                self.gen.logMsg('warn', '*** No matching API versions found!')
+            #
+            # Pass 1: loop over requested API versions and extensions tagging
+            #   types/commands/features as required (in an <require> block) or no
+            #   longer required (in an <remove> block). It is possible to remove
+            #   a feature in one version and restore it later by requiring it in
+            #   a later version.
+            # If a profile other than 'None' is being generated, it must
+            #   match the profile attribute (if any) of the <require> and
+            #   <remove> tags.
+            self.gen.diag('*** PASS 1: TAG FEATURES ********************************************')
+            for f in features:
+                self.gen.diag('*** PASS 1: Tagging required and removed features for',
+                    f.name)
+                self.requireAndRemoveFeatures(f.elem, self.genOpts.apiname, self.genOpts.profile)
+                self.assignAdditionalValidity(f.elem, self.genOpts.apiname, self.genOpts.profile)
+            self.selections[selectionKey] = (features, apiMatch,
+                                             self.context.snapshot())
+        return features
+    #
+    # interfaceHash(genOpts) - return a hash of the registry XML that an
+    #   interface generated with genOpts is built from: the selected
+    #   features, and every type, group, enumerant and command they
+    #   require, including enumerants added to required groups by
+    #   extensions. It only changes when one of those elements does. The
+    #   hash is kept for later calls with the same selection options.
+    def interfaceHash(self, genOpts):
+        """Hash the registry elements selected and required by genOpts"""
+        selectionKey = self.selectionKey(genOpts)
+        if (selectionKey in self.interfaceHashes):
+            return self.interfaceHashes[selectionKey]
+        self.genOpts = genOpts
+        features = self.selectAndTagFeatures()
+        hash = hashlib.sha256()
         for f in features:
-            self.gen.logMsg('diag', '*** PASS 1: Tagging required and removed features for',
-                f.name)
-            self.requireAndRemoveFeatures(f.elem, self.genOpts.apiname, self.genOpts.profile)
-            self.assignAdditionalValidity(f.elem, self.genOpts.apiname, self.genOpts.profile)
+            hash.update(etree.tostring(f.elem))
+        for dictionary in [ self.typedict, self.groupdict, self.enumdict, self.cmddict ]:
+            for info in dictionary.values():
+                if (info.required):
+                    hash.update(etree.tostring(info.elem))
+                    if (dictionary is self.groupdict):
+                        for enuminfo in info.enums:
+                            hash.update(etree.tostring(enuminfo.elem))
+        self.apiReset()
+        self.interfaceHashes[selectionKey] = hash.hexdigest()
+        return self.interfaceHashes[selectionKey]
+    #
+    # apiGen(genOpts) - generate interface for specified versions
+    #   genOpts - GeneratorOptions object with parameters used
+    #   by the Generator object.
+    def apiGen(self, genOpts):
+        """Generate interfaces for the specified API type and range of versions"""
+        #
+        self.gen.diag('*******************************************')
+        self.gen.diag('  Registry.apiGen file:', genOpts.filename,
+                      'api:', genOpts.apiname,
+                      'profile:', genOpts.profile)
+        self.gen.diag('*******************************************')
+        #
+        self.genOpts = genOpts
+        #
+        # Select the features to generate and tag what they require (Pass 1)
+        features = self.selectAndTagFeatures()
         #
         # Pass 2: loop over specified API versions and extensions printing
         #   declarations for required things which haven't already been
         #   generated.
-        self.gen.logMsg('diag', '*** PASS 2: GENERATE INTERFACES FOR FEATURES ************************')
+        self.gen.diag('*** PASS 2: GENERATE INTERFACES FOR FEATURES ************************')
         self.gen.beginFile(self.genOpts)
         for f in features:
-            self.gen.logMsg('diag', '*** PASS 2: Generating interface for',
+            self.gen.diag('*** PASS 2: Generating interface for',
                 f.name)
             emit = self.emitFeatures = f.emit
             if (not emit):
-                self.gen.logMsg('diag', '*** PASS 2: NOT declaring feature',
-                    f.elem.get('name'), 'because it is not tagged for emission')
+                self.gen.diag('*** PASS 2: NOT declaring feature',
+                    f.name, 'because it is not tagged for emission')
             # Generate the interface (or just tag its elements as having been
             # emitted, if they haven't been).
             self.gen.beginFeature(f.elem, emit)
@@ -761,18 +1509,11 @@ class Registry:
             self.gen.endFeature()
         self.gen.endFile()
     #
-    # apiReset - use between apiGen() calls to reset internal state
-    #
+    # apiReset - use between apiGen() calls to reset internal state. Only
+    # the features touched since the last reset are visited.
     def apiReset(self):
         """Reset type/enum/command dictionaries before generating another API"""
-        for type in self.typedict:
-            self.typedict[type].resetState()
-        for enum in self.enumdict:
-            self.enumdict[enum].resetState()
-        for cmd in self.cmddict:
-            self.cmddict[cmd].resetState()
-        for cmd in self.apidict:
-            self.apidict[cmd].resetState()
+        self.context.reset()
     #
     # validateGroups - check that group= attributes match actual groups
     #
@@ -780,7 +1521,7 @@ class Registry:
         """Validate group= attributes on <param> and <proto> tags"""
         # Keep track of group names not in <group> tags
         badGroup = {}
-        self.gen.logMsg('diag', '*** VALIDATING GROUP ATTRIBUTES ***')
+        self.gen.diag('*** VALIDATING GROUP ATTRIBUTES ***')
         for cmd in self.reg.findall('commands/command'):
             proto = cmd.find('proto')
             funcname = cmd.find('proto/name').text
@@ -808,6 +1549,6 @@ class Registry:
                         else:
                             badGroup[group] = badGroup[group] +  1
         if (len(badGroup.keys()) > 0):
-            self.gen.logMsg('diag', '*** SUMMARY OF UNRECOGNIZED GROUPS ***')
+            self.gen.diag('*** SUMMARY OF UNRECOGNIZED GROUPS ***')
             for key in sorted(badGroup.keys()):
-                self.gen.logMsg('diag', '    ', key, ' occurred ', badGroup[key], ' times')
+                self.gen.diag('    ', key, ' occurred ', badGroup[key], ' times')
@@ -126,25 +126,7 @@ class ThreadOutputGenerator(OutputGenerator):
         self.sections = dict([(section, []) for section in self.ALL_SECTIONS])
         self.intercepts = []
 
-    # Check if the parameter passed in is a pointer to an array
-    def paramIsArray(self, param):
-        return param.attrib.get('len') is not None
-
-    # Check if the parameter passed in is a pointer
-    def paramIsPointer(self, param):
-        ispointer = False
-        for elem in param:
-            #write('paramIsPointer '+elem.text, file=sys.stderr)
-            #write('elem.tag '+elem.tag, file=sys.stderr)
-            #if (elem.tail is None):
-            #    write('elem.tail is None', file=sys.stderr)
-            #else:
-            #    write('elem.tail '+elem.tail, file=sys.stderr)
-            if ((elem.tag is not 'type') and (elem.tail is not None)) and '*' in elem.tail:
-                ispointer = True
-            #    write('is pointer', file=sys.stderr)
-        return ispointer
-    def makeThreadUseBlock(self, cmd, functionprefix):
+    def makeThreadUseBlock(self, cmdinfo, functionprefix):
         """Generate C function pointer typedef for <command> Element"""
         paramdecl = ''
         thread_check_dispatchable_objects = [
@@ -176,24 +158,23 @@ class ThreadOutputGenerator(OutputGenerator):
         ]
 
         # Find and add any parameters that are thread unsafe
-        params = cmd.findall('param')
+        params = cmdinfo.signature.params
         for param in params:
-            paramname = param.find('name')
-            if False: # self.paramIsPointer(param):
-                paramdecl += '    // not watching use of pointer ' + paramname.text + '\n'
+            if False: # param.tailPointer:
+                paramdecl += '    // not watching use of pointer ' + param.name + '\n'
             else:
-                externsync = param.attrib.get('externsync')
+                externsync = param.externsync
                 if externsync == 'true':
-                    if self.paramIsArray(param):
-                        paramdecl += '    for (uint32_t index=0;index<' + param.attrib.get('len') + ';index++) {\n'
-                        paramdecl += '        ' + functionprefix + 'WriteObject(my_data, ' + paramname.text + '[index]);\n'
+                    if param.rawLen is not None:
+                        paramdecl += '    for (uint32_t index=0;index<' + param.rawLen + ';index++) {\n'
+                        paramdecl += '        ' + functionprefix + 'WriteObject(my_data, ' + param.name + '[index]);\n'
                         paramdecl += '    }\n'
                     else:
-                        paramdecl += '    ' + functionprefix + 'WriteObject(my_data, ' + paramname.text + ');\n'
-                elif (param.attrib.get('externsync')):
-                    if self.paramIsArray(param):
+                        paramdecl += '    ' + functionprefix + 'WriteObject(my_data, ' + param.name + ');\n'
+                elif (externsync):
+                    if param.rawLen is not None:
                         # Externsync can list pointers to arrays of members to synchronize
-                        paramdecl += '    for (uint32_t index=0;index<' + param.attrib.get('len') + ';index++) {\n'
+                        paramdecl += '    for (uint32_t index=0;index<' + param.rawLen + ';index++) {\n'
                         for member in externsync.split(","):
                             # Replace first empty [] in member name with index
                             element = member.replace('[]','[index]',1)
@@ -216,39 +197,34 @@ class ThreadOutputGenerator(OutputGenerator):
                             member = str(member).replace("::", "->")
                             paramdecl += '    ' + functionprefix + 'WriteObject(my_data, ' + member + ');\n'
                 else:
-                    paramtype = param.find('type')
-                    if paramtype is not None:
-                        paramtype = paramtype.text
-                    else:
-                        paramtype = 'None'
+                    paramtype = param.type
                     if paramtype in thread_check_dispatchable_objects or paramtype in thread_check_nondispatchable_objects:
-                        if self.paramIsArray(param) and ('pPipelines' != paramname.text):
-                            paramdecl += '    for (uint32_t index=0;index<' + param.attrib.get('len') + ';index++) {\n'
-                            paramdecl += '        ' + functionprefix + 'ReadObject(my_data, ' + paramname.text + '[index]);\n'
+                        if param.rawLen is not None and ('pPipelines' != param.name):
+                            paramdecl += '    for (uint32_t index=0;index<' + param.rawLen + ';index++) {\n'
+                            paramdecl += '        ' + functionprefix + 'ReadObject(my_data, ' + param.name + '[index]);\n'
                             paramdecl += '    }\n'
-                        elif not self.paramIsPointer(param):
+                        elif not param.tailPointer:
                             # Pointer params are often being created.
                             # They are not being read from.
-                            paramdecl += '    ' + functionprefix + 'ReadObject(my_data, ' + paramname.text + ');\n'
-        explicitexternsyncparams = cmd.findall("param[@externsync]")
-        if (explicitexternsyncparams is not None):
-            for param in explicitexternsyncparams:
-                externsyncattrib = param.attrib.get('externsync')
-                paramname = param.find('name')
-                paramdecl += '    // Host access to '
-                if externsyncattrib == 'true':
-                    if self.paramIsArray(param):
-                        paramdecl += 'each member of ' + paramname.text
-                    elif self.paramIsPointer(param):
-                        paramdecl += 'the object referenced by ' + paramname.text
-                    else:
-                        paramdecl += paramname.text
+                            paramdecl += '    ' + functionprefix + 'ReadObject(my_data, ' + param.name + ');\n'
+        for param in params:
+            externsyncattrib = param.externsync
+            if externsyncattrib is None:
+                continue
+            paramdecl += '    // Host access to '
+            if externsyncattrib == 'true':
+                if param.rawLen is not None:
+                    paramdecl += 'each member of ' + param.name
+                elif param.tailPointer:
+                    paramdecl += 'the object referenced by ' + param.name
                 else:
-                    paramdecl += externsyncattrib
-                paramdecl += ' must be externally synchronized\n'
+                    paramdecl += param.name
+            else:
+                paramdecl += externsyncattrib
+            paramdecl += ' must be externally synchronized\n'
 
         # Find and add any "implicit" parameters that are thread unsafe
-        implicitexternsyncparams = cmd.find('implicitexternsyncparams')
+        implicitexternsyncparams = cmdinfo.elem.find('implicitexternsyncparams')
         if (implicitexternsyncparams is not None):
             for elem in implicitexternsyncparams:
                 paramdecl += '    // '
@@ -353,7 +329,7 @@ class ThreadOutputGenerator(OutputGenerator):
     # structs etc.)
     def genStruct(self, typeinfo, typeName):
         OutputGenerator.genStruct(self, typeinfo, typeName)
-        body = 'typedef ' + typeinfo.elem.get('category') + ' ' + typeName + ' {\n'
+        body = 'typedef ' + typeinfo.category + ' ' + typeName + ' {\n'
         # paramdecl = self.makeCParamDecl(typeinfo.elem, self.genOpts.alignFuncParam)
         for member in typeinfo.elem.findall('.//member'):
             body += self.makeCParamDecl(member, self.genOpts.alignFuncParam)
@@ -410,10 +386,10 @@ class ThreadOutputGenerator(OutputGenerator):
             self.appendSection('command', '// TODO - not wrapping EXT function ' + name)
             return
         # Determine first if this function needs to be intercepted
-        startthreadsafety = self.makeThreadUseBlock(cmdinfo.elem, 'start')
+        startthreadsafety = self.makeThreadUseBlock(cmdinfo, 'start')
         if startthreadsafety is None:
             return
-        finishthreadsafety = self.makeThreadUseBlock(cmdinfo.elem, 'finish')
+        finishthreadsafety = self.makeThreadUseBlock(cmdinfo, 'finish')
         # record that the function will be intercepted
         if (self.featureExtraProtect != None):
             self.intercepts += [ '#ifdef %s' % self.featureExtraProtect ]
@@ -429,8 +405,8 @@ class ThreadOutputGenerator(OutputGenerator):
         self.appendSection('command', '{')
         # setup common to call wrappers
         # first parameter is always dispatchable
-        dispatchable_type = cmdinfo.elem.find('param/type').text
-        dispatchable_name = cmdinfo.elem.find('param/name').text
+        dispatchable_type = cmdinfo.signature.params[0].type
+        dispatchable_name = cmdinfo.signature.params[0].name
         self.appendSection('command', '    dispatch_key key = get_dispatch_key('+dispatchable_name+');')
         self.appendSection('command', '    layer_data *my_data = GetLayerDataPtr(key, layer_data_map);')
         if dispatchable_type in ["VkPhysicalDevice", "VkInstance"]:
@@ -438,11 +414,11 @@ class ThreadOutputGenerator(OutputGenerator):
         else:
             self.appendSection('command', '    VkLayerDispatchTable *pTable = my_data->device_dispatch_table;')
         # Declare result variable, if any.
-        resulttype = cmdinfo.elem.find('proto/type')
-        if (resulttype != None and resulttype.text == 'void'):
+        resulttype = cmdinfo.signature.returnType
+        if (resulttype == 'void'):
           resulttype = None
         if (resulttype != None):
-            self.appendSection('command', '    ' + resulttype.text + ' result;')
+            self.appendSection('command', '    ' + resulttype + ' result;')
             assignresult = 'result = '
         else:
             assignresult = ''
@@ -451,9 +427,8 @@ class ThreadOutputGenerator(OutputGenerator):
         self.appendSection('command', '    if (threadChecks) {')
         self.appendSection('command', "    "+"\n    ".join(str(startthreadsafety).rstrip().split("\n")))
         self.appendSection('command', '    }')
-        params = cmdinfo.elem.findall('param/name')
-        paramstext = ','.join([str(param.text) for param in params])
-        API = cmdinfo.elem.attrib.get('name').replace('vk','pTable->',1)
+        paramstext = ','.join([param.name for param in cmdinfo.signature.params])
+        API = cmdinfo.name.replace('vk','pTable->',1)
         self.appendSection('command', '    ' + assignresult + API + '(' + paramstext + ');')
         self.appendSection('command', '    if (threadChecks) {')
         self.appendSection('command', "    "+"\n    ".join(str(finishthreadsafety).rstrip().split("\n")))
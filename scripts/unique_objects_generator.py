@@ -161,6 +161,9 @@ class UniqueObjectsOutputGenerator(OutputGenerator):
         self.handleTypes = set()                          # Set of handle type names
         self.commands = []                                # List of CommandData records for all Vulkan commands
         self.structMembers = []                           # List of StructMemberData records for all Vulkan structs
+        self.structMemberDict = dict()                    # Map of Vulkan struct typename to its list of members
+        self.structNdos = dict()                          # Map of Vulkan struct typename to True if it contains an NDO
+        self.structUsers = dict()                         # Map of typename to set of Vulkan struct typenames with a member of that type
         self.flags = set()                                # Map of flags typenames
         # Named tuples to store struct and command data
         self.StructType = namedtuple('StructType', ['name', 'value'])
@@ -183,10 +186,6 @@ class UniqueObjectsOutputGenerator(OutputGenerator):
     def makeProtoName(self, name, tail):
         return self.genOpts.apientry + name[2:] + tail
     #
-    # Check if the parameter passed in is a pointer to an array
-    def paramIsArray(self, param):
-        return param.attrib.get('len') is not None
-    #
     def beginFile(self, genOpts):
         OutputGenerator.beginFile(self, genOpts)
         # User-supplied prefix text, if any (list of strings)
@@ -235,6 +234,9 @@ class UniqueObjectsOutputGenerator(OutputGenerator):
         self.handleTypes = set()
         self.commands = []
         self.structMembers = []
+        self.structMemberDict = dict()
+        self.structNdos = dict()
+        self.structUsers = dict()
         self.cmdMembers = []
         self.flags = set()
         self.StructMemberData = namedtuple('StructMemberData', ['name', 'members'])
@@ -273,10 +275,9 @@ class UniqueObjectsOutputGenerator(OutputGenerator):
     #
     def genType(self, typeinfo, name):
         OutputGenerator.genType(self, typeinfo, name)
-        typeElem = typeinfo.elem
         # If the type is a struct type, traverse the imbedded <member> tags generating a structure.
         # Otherwise, emit the tag text.
-        category = typeElem.get('category')
+        category = typeinfo.category
         if (category == 'struct' or category == 'union'):
             self.structNames.append(name)
             self.genStruct(typeinfo, name)
@@ -286,56 +287,18 @@ class UniqueObjectsOutputGenerator(OutputGenerator):
         # self.sections[section].append('SECTION: ' + section + '\n')
         self.sections[section].append(text)
     #
-    # Check if the parameter passed in is a pointer
-    def paramIsPointer(self, param):
-        ispointer = False
-        for elem in param:
-            if ((elem.tag is not 'type') and (elem.tail is not None)) and '*' in elem.tail:
-                ispointer = True
-        return ispointer
-    #
     # Get the category of a type
     def getTypeCategory(self, typename):
-        types = self.registry.tree.findall("types/type")
-        for elem in types:
-            if (elem.find("name") is not None and elem.find('name').text == typename) or elem.attrib.get('name') == typename:
-                return elem.attrib.get('category')
+        return self.registry.categorydict.get(typename)
     #
     # Check if a parent object is dispatchable or not
     def isHandleTypeNonDispatchable(self, handletype):
-        handle = self.registry.tree.find("types/type/[name='" + handletype + "'][@category='handle']")
-        if handle is not None and handle.find('type').text == 'VK_DEFINE_NON_DISPATCHABLE_HANDLE':
+        handle = self.registry.handledict.get(handletype)
+        if handle is not None and not handle.dispatchable:
             return True
         else:
             return False
     #
-    # Retrieve the type and name for a parameter
-    def getTypeNameTuple(self, param):
-        type = ''
-        name = ''
-        for elem in param:
-            if elem.tag == 'type':
-                type = noneStr(elem.text)
-            elif elem.tag == 'name':
-                name = noneStr(elem.text)
-        return (type, name)
-    #
-    # Retrieve the value of the len tag
-    def getLen(self, param):
-        result = None
-        len = param.attrib.get('len')
-        if len and len != 'null-terminated':
-            # For string arrays, 'len' can look like 'count,null-terminated', indicating that we
-            # have a null terminated array of strings.  We strip the null-terminated from the
-            # 'len' field and only return the parameter specifying the string count
-            if 'null-terminated' in len:
-                result = len.split(',')[0]
-            else:
-                result = len
-            # Spec has now notation for len attributes, using :: instead of platform specific pointer symbol
-            result = str(result).replace('::', '->')
-        return result
-    #
     # Generate a VkStructureType based on a structure typename
     def genVkStructureType(self, typename):
         # Add underscore between lowercase then uppercase
@@ -352,63 +315,64 @@ class UniqueObjectsOutputGenerator(OutputGenerator):
     # declarations are supported (no nested structs etc.)
     def genStruct(self, typeinfo, typeName):
         OutputGenerator.genStruct(self, typeinfo, typeName)
-        members = typeinfo.elem.findall('.//member')
-        # Iterate over members once to get length parameters for arrays
-        lens = set()
-        for member in members:
-            len = self.getLen(member)
-            if len:
-                lens.add(len)
+        layout = typeinfo.layout
+        # Process VkStructureType
+        if layout.stypeMember is not None:
+            # The required struct type value, from the sType member's
+            # 'values' attribute
+            value = layout.stype
+            if value is None:
+                value = self.genVkStructureType(typeName)
+            # Store the required type value
+            self.structTypes[typeName] = self.StructType(name=layout.stypeMember, value=value)
         # Generate member info
         membersInfo = []
-        for member in members:
-            # Get the member's type and name
-            info = self.getTypeNameTuple(member)
-            type = info[0]
-            name = info[1]
-            cdecl = self.makeCParamDecl(member, 0)
-            # Process VkStructureType
-            if type == 'VkStructureType':
-                # Extract the required struct type value from the comments
-                # embedded in the original text defining the 'typeinfo' element
-                rawXml = etree.tostring(typeinfo.elem).decode('ascii')
-                result = re.search(r'VK_STRUCTURE_TYPE_\w+', rawXml)
-                if result:
-                    value = result.group(0)
-                else:
-                    value = self.genVkStructureType(typeName)
-                # Store the required type value
-                self.structTypes[typeName] = self.StructType(name=name, value=value)
+        for member in layout.members:
+            name = member.name
             # Store pointer/array/string info
-            membersInfo.append(self.CommandParam(type=type,
+            membersInfo.append(self.CommandParam(type=member.type,
                                                  name=name,
-                                                 ispointer=self.paramIsPointer(member),
-                                                 isconst=True if 'const' in cdecl else False,
-                                                 iscount=True if name in lens else False,
-                                                 len=self.getLen(member),
-                                                 extstructs=member.attrib.get('validextensionstructs') if name == 'pNext' else None,
-                                                 cdecl=cdecl,
+                                                 ispointer=member.tailPointer,
+                                                 isconst=member.isconst,
+                                                 iscount=True if name in layout.lens else False,
+                                                 len=member.len,
+                                                 extstructs=member.extstructs if name == 'pNext' else None,
+                                                 cdecl=member.cdecl,
                                                  islocal=False,
                                                  iscreate=False,
                                                  isdestroy=False))
         self.structMembers.append(self.StructMemberData(name=typeName, members=membersInfo))
+        self.structMemberDict[typeName] = membersInfo
+        self.analyze_struct_ndos(typeName, membersInfo)
     #
     # Insert a lock_guard line
     def lock_guard(self, indent):
         return '%sstd::lock_guard<std::mutex> lock(global_lock);\n' % indent
     #
+    # Update the NDO analysis of the structs seen so far with a new struct.
+    # A struct contains an NDO if it has an NDO member, or a member of a struct
+    # type which contains one. When a struct is found to contain an NDO, so are
+    # the structs using it, which are marked in turn until no more are found.
+    # This keeps the analysis a fixed point over all the structs seen so far,
+    # however they refer to each other, while visiting each struct only when
+    # it's added or marked.
+    def analyze_struct_ndos(self, struct_name, struct_members):
+        contains_ndo = False
+        for member in struct_members:
+            self.structUsers.setdefault(member.type, set()).add(struct_name)
+            if self.isHandleTypeNonDispatchable(member.type) or self.structNdos.get(member.type) == True:
+                contains_ndo = True
+        self.structNdos[struct_name] = contains_ndo
+        pending = [struct_name] if contains_ndo else []
+        while pending:
+            for user in self.structUsers.get(pending.pop(), ()):
+                if self.structNdos.get(user) == False:
+                    self.structNdos[user] = True
+                    pending.append(user)
+    #
     # Determine if a struct has an NDO as a member or an embedded member
     def struct_contains_ndo(self, struct_item):
-        struct_member_dict = dict(self.structMembers)
-        struct_members = struct_member_dict[struct_item]
-
-        for member in struct_members:
-            if self.isHandleTypeNonDispatchable(member.type):
-                return True
-            elif member.type in struct_member_dict:
-                if self.struct_contains_ndo(member.type) == True:
-                    return True
-        return False
+        return self.structNdos[struct_item]
     #
     # Return list of struct members which contain, or which sub-structures contain
     # an NDO in a given list of parameters or members
@@ -557,7 +521,7 @@ class UniqueObjectsOutputGenerator(OutputGenerator):
         decls = ''
         pre_code = ''
         post_code = ''
-        struct_member_dict = dict(self.structMembers)
+        struct_member_dict = self.structMemberDict
         index = 'index%s' % str(array_index)
         array_index += 1
         # Process any NDOs in this structure and recurse for any sub-structs in this struct
@@ -681,27 +645,18 @@ class UniqueObjectsOutputGenerator(OutputGenerator):
             return
         # Add struct-member type information to command parameter information
         OutputGenerator.genCmd(self, cmdinfo, cmdname)
-        members = cmdinfo.elem.findall('.//param')
-        # Iterate over members once to get length parameters for arrays
-        lens = set()
-        for member in members:
-            len = self.getLen(member)
-            if len:
-                lens.add(len)
-        struct_member_dict = dict(self.structMembers)
+        signature = cmdinfo.signature
+        struct_member_dict = self.structMemberDict
         # Generate member info
         membersInfo = []
-        for member in members:
-            # Get type and name of member
-            info = self.getTypeNameTuple(member)
-            type = info[0]
-            name = info[1]
-            cdecl = self.makeCParamDecl(member, 0)
+        for member in signature.params:
+            type = member.type
+            name = member.name
             # Check for parameter name in lens set
-            iscount = True if name in lens else False
-            len = self.getLen(member)
-            isconst = True if 'const' in cdecl else False
-            ispointer = self.paramIsPointer(member)
+            iscount = True if name in signature.lens else False
+            len = member.len
+            isconst = member.isconst
+            ispointer = member.tailPointer
             # Mark param as local if it is an array of NDOs
             islocal = False;
             if self.isHandleTypeNonDispatchable(type) == True:
@@ -721,8 +676,8 @@ class UniqueObjectsOutputGenerator(OutputGenerator):
                                                  isconst=isconst,
                                                  iscount=iscount,
                                                  len=len,
-                                                 extstructs=member.attrib.get('validextensionstructs') if name == 'pNext' else None,
-                                                 cdecl=cdecl,
+                                                 extstructs=member.extstructs if name == 'pNext' else None,
+                                                 cdecl=member.cdecl,
                                                  islocal=islocal,
                                                  iscreate=iscreate,
                                                  isdestroy=isdestroy))
@@ -743,16 +698,16 @@ class UniqueObjectsOutputGenerator(OutputGenerator):
         self.appendSection('command', decls[0][:-1])
         self.appendSection('command', '{')
         # Setup common to call wrappers, first parameter is always dispatchable
-        dispatchable_type = cmdinfo.elem.find('param/type').text
-        dispatchable_name = cmdinfo.elem.find('param/name').text
+        dispatchable_type = signature.params[0].type
+        dispatchable_name = signature.params[0].name
         # Generate local instance/pdev/device data lookup
         self.appendSection('command', '    layer_data *dev_data = GetLayerDataPtr(get_dispatch_key('+dispatchable_name+'), layer_data_map);')
         # Handle return values, if any
-        resulttype = cmdinfo.elem.find('proto/type')
-        if (resulttype != None and resulttype.text == 'void'):
+        resulttype = signature.returnType
+        if (resulttype == 'void'):
           resulttype = None
         if (resulttype != None):
-            assignresult = resulttype.text + ' result = '
+            assignresult = resulttype + ' result = '
         else:
             assignresult = ''
         # Pre-pend declarations and pre-api-call codegen
@@ -762,9 +717,8 @@ class UniqueObjectsOutputGenerator(OutputGenerator):
             self.appendSection('command', "\n".join(str(api_pre).rstrip().split("\n")))
         # Generate the API call itself
         # Gather the parameter items
-        params = cmdinfo.elem.findall('param/name')
         # Pull out the text for each of the parameters, separate them by commas in a list
-        paramstext = ', '.join([str(param.text) for param in params])
+        paramstext = ', '.join([param.name for param in signature.params])
         # If any of these paramters has been replaced by a local var, fix up the list
         cmd_member_dict = dict(self.cmdMembers)
         params = cmd_member_dict[cmdname]
@@ -776,9 +730,9 @@ class UniqueObjectsOutputGenerator(OutputGenerator):
                     paramstext = paramstext.replace(param.name, '(%s %s)local_%s' % ('const', param.type, param.name))
         # Use correct dispatch table
         if dispatchable_type in ["VkPhysicalDevice", "VkInstance"]:
-            API = cmdinfo.elem.attrib.get('name').replace('vk','dev_data->instance_dispatch_table->',1)
+            API = cmdinfo.name.replace('vk','dev_data->instance_dispatch_table->',1)
         else:
-            API = cmdinfo.elem.attrib.get('name').replace('vk','dev_data->device_dispatch_table->',1)
+            API = cmdinfo.name.replace('vk','dev_data->device_dispatch_table->',1)
         # Put all this together for the final down-chain call
         self.appendSection('command', '    ' + assignresult + API + '(' + paramstext + ');')
         # And add the post-API-call codegen